@@ -2,14 +2,37 @@ import numpy as np
 import soundfile as sf
 from scipy.signal import butter, lfilter
 
+import postprocessing
+from precision import check_dtype, resolve_dtype, time_vector
+from string_filter import karplus_strong, noise_bursts
+
 
 class GuitarStringModel:
-    def __init__(self, fs=44100):
+    def __init__(self, fs=44100, dtype=np.float64):
         self.fs = fs
+        self.dtype = resolve_dtype(dtype)
+
+    def pluck(self, fundamental_freq, duration=2.0, velocity=1.0, palm_mute=False, normalize=True):
+        """Improved Karplus-Strong string synthesis with added randomness
+
+        normalize=False skips the final peak normalization, for callers that
+        mix notes and normalize the mix once.
+        """
+        delay_line = self._excitation(fundamental_freq, velocity)
+        output = self._string_loop(delay_line, duration, palm_mute)
+
+        # === Add multiple harmonics with randomized amplitude and decay ===
+        output = check_dtype(self._add_body_resonance(output, fundamental_freq), self.dtype, "body resonance")
+
+        # === Simple DI processing with variable saturation and low-level hum ===
+        output = check_dtype(self._di_processing(output), self.dtype, "DI processing")
 
-    def pluck(self, fundamental_freq, duration=2.0, velocity=1.0, palm_mute=False):
-        """Improved Karplus-Strong string synthesis with added randomness"""
+        if not normalize:
+            return output
+        return check_dtype(self._normalize(output), self.dtype, "normalization")
 
+    def _excitation(self, fundamental_freq, velocity):
+        """Delay line initialized with filtered noise and a random attack decay"""
         # Calculate delay line length for fundamental frequency
         delay_samples = int(self.fs / fundamental_freq)
 
@@ -19,21 +42,24 @@ class GuitarStringModel:
         # Random lowpass cutoff frequency for excitation noise (simulate pick hardness)
         cutoff = np.random.uniform(4000, 8000)  # Hz
         b, a = butter(2, cutoff / (self.fs / 2), btype='low')
-        noise = np.random.uniform(-1, 1, excitation_length) * velocity
-        excitation = lfilter(b, a, noise)
+        noise = (np.random.uniform(-1, 1, excitation_length) * velocity).astype(self.dtype)
+        excitation = lfilter(b.astype(self.dtype), a.astype(self.dtype), noise)
 
         # Randomize attack envelope decay rate slightly per pluck
         decay_rate = np.random.uniform(0.07, 0.13) * excitation_length
-        attack_env = np.exp(-np.arange(excitation_length) / decay_rate)
+        attack_env = np.exp(-np.arange(excitation_length, dtype=self.dtype) / decay_rate)
         excitation *= attack_env
 
         # Initialize delay line with excitation
-        delay_line = np.zeros(delay_samples)
+        delay_line = np.zeros(delay_samples, dtype=self.dtype)
         delay_line[:min(len(excitation), delay_samples)] = excitation[:delay_samples]
 
+        return delay_line
+
+    def _string_loop(self, delay_line, duration, palm_mute):
+        """Karplus-Strong loop over an initialized delay line (modified in place)"""
         # Calculate total samples needed
         total_samples = int(duration * self.fs)
-        output = np.zeros(total_samples)
 
         # === Randomized damping and low-pass filter coefficients ===
         base_damping = 0.1 if palm_mute else 0.9985
@@ -45,103 +71,60 @@ class GuitarStringModel:
 
         # Low frequency oscillator for subtle damping modulation
         lfo_freq = 0.1  # Hz
-        lfo = 0.0002 * np.sin(2 * np.pi * lfo_freq * np.arange(total_samples) / self.fs)
-
-        delay_pos = 0
-        last_filtered = 0
-
-        for start_idx in range(0, total_samples):
-            # Get current sample from delay line
-            current_sample = delay_line[delay_pos]
-
-            # Add subtle random noise bursts to simulate finger/string noise
-            noise_burst = 0
-            if np.random.rand() < 0.00005:  # very rare noise burst
-                noise_burst = np.random.uniform(-0.1, 0.1)
-
-            output[start_idx] = current_sample + noise_burst
-
-            # Next sample for averaging (Karplus-Strong filtering)
-            next_pos = (delay_pos + 1) % delay_samples
-            next_sample = delay_line[next_pos]
-
-            # Apply Karplus-Strong filter: average + damping + low-pass + LFO modulation
-            averaged = 0.5 * (current_sample + next_sample)
-            filtered = lp_coeff * averaged + (1 - lp_coeff) * last_filtered
-
-            # Modulate damping with slow LFO to simulate timbre fluctuations
-            current_damping = damping + lfo[start_idx]
-            current_damping = np.clip(current_damping, 0, 1)  # keep damping in reasonable range
-            damped = current_damping * filtered
-
-            delay_line[delay_pos] = damped
-            last_filtered = filtered
-
-            # Advance delay line position with slight vibrato modulation (fractional delay approximation)
-            vibrato_depth = 0.0002  # fraction of delay length
-            vibrato_freq = 5.0  # Hz
-            vibrato_mod = vibrato_depth * np.sin(2 * np.pi * vibrato_freq * start_idx / self.fs)
-            # Normally requires fractional delay interpolation.
-            # Approximate by occasionally skipping or repeating a sample:
-            if vibrato_mod > 0.001:
-                delay_pos = (delay_pos + 2) % delay_samples
-            elif vibrato_mod < -0.001:
-                delay_pos = (delay_pos + 0) % delay_samples
-            else:
-                delay_pos = (delay_pos + 1) % delay_samples
+        lfo = 0.0002 * np.sin(2 * np.pi * lfo_freq * time_vector(total_samples, self.fs, self.dtype))
 
-        # === Add multiple harmonics with randomized amplitude and decay ===
-        output = self._add_body_resonance(output, fundamental_freq)
-
-        # === Simple DI processing with variable saturation and low-level hum ===
-        output = self._di_processing(output)
+        # Modulate damping with slow LFO to simulate timbre fluctuations
+        current_damping = np.clip(damping + lfo, 0, 1)  # keep damping in reasonable range
 
-        # Normalize output
-        if np.max(np.abs(output)) > 0:
-            output = output / np.max(np.abs(output)) * 0.8
+        # Add subtle random noise bursts to simulate finger/string noise (output only)
+        noise = noise_bursts(total_samples, 0.00005, -0.1, 0.1)  # very rare noise burst
 
-        return output
+        # Slight vibrato would skip or repeat a sample once its modulation passes
+        # 0.001, but at a depth of 0.0002 (fraction of delay length) it never
+        # does, so the loop is a plain recursive filter with modulated damping
+        return karplus_strong(delay_line, total_samples, current_damping, lp_coeff, output_noise=noise)
 
     def _add_body_resonance(self, signal, fundamental_freq):
-        """Add multiple harmonics and body resonance with randomness"""
-        t = np.arange(len(signal)) / self.fs
-
+        """Add multiple harmonics and body resonance with randomness (in place)"""
         # Add 2nd to 4th harmonics with random amplitude and decay
+        partials = []
         for n in [2, 3, 4]:
             amp = np.random.uniform(0.005, 0.012) / n
             decay = np.random.uniform(0.3, 0.6)
-            harmonic = amp * np.sin(2 * np.pi * fundamental_freq * n * t)
-            harmonic *= np.exp(-t * decay)
-            signal += harmonic
+            partials.append((2 * np.pi * fundamental_freq * n, amp, decay))
 
         # Body resonance frequency and amplitude randomized slightly
         body_freq = np.random.uniform(140.0, 160.0)
         body_amp = np.random.uniform(0.03, 0.06)
         body_decay = np.random.uniform(1.5, 2.5)
-        body_resonance = body_amp * np.sin(2 * np.pi * body_freq * t)
-        body_resonance *= np.exp(-t * body_decay)
-        signal += body_resonance
+        partials.append((2 * np.pi * body_freq, body_amp, body_decay))
 
-        return signal
+        return postprocessing.add_partials(signal, self.fs, partials)
+
+    def _di_processing(self, signal, saturation_gain=None, hum_freq=None):
+        """Simple DI box simulation with variable saturation and low hum (in place)
 
-    def _di_processing(self, signal):
-        """Simple DI box simulation with variable saturation and low hum"""
-        # High-pass filter to remove DC
-        b, a = butter(2, 40, 'hp', fs=self.fs)
-        signal = lfilter(b, a, signal)
+        saturation_gain and hum_freq are drawn at random when not given.
+        """
+        # High-pass filter to remove DC (as SOS so it stays accurate in float32)
+        sos = butter(2, 40, 'hp', fs=self.fs, output='sos')
+        postprocessing.filter_in_place(signal, sos=sos.astype(self.dtype))
 
         # Variable subtle saturation per run
-        saturation_gain = np.random.uniform(1.001, 1.003)
-        signal = np.tanh(signal * saturation_gain) * 0.9
+        if saturation_gain is None:
+            saturation_gain = np.random.uniform(1.001, 1.003)
+        postprocessing.saturate(signal, saturation_gain, 0.9)
 
         # Add low-level hum (50 Hz or 60 Hz)
-        hum_freq = np.random.choice([50, 60])
-        t = np.arange(len(signal)) / self.fs
-        hum = 0.0001 * np.sin(2 * np.pi * hum_freq * t)
-        signal += hum
+        if hum_freq is None:
+            hum_freq = np.random.choice([50, 60])
+        postprocessing.add_partials(signal, self.fs, [(2 * np.pi * hum_freq, 0.0001, None)])
 
         return signal
 
+    def _normalize(self, signal, peak=0.8):
+        return postprocessing.normalize(signal, peak)
+
 
 # Usage example
 def main():
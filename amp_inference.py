@@ -0,0 +1,644 @@
+"""Streaming NumPy inference for captured amp models
+
+The GuitarLSTM and SmartAmpPro captures in the README could only be judged
+by loading them into a plugin or re-running Colab. This runs them locally,
+block by block over DI files of any length, with nothing but NumPy and
+soundfile (h5py for Keras .h5 files), and reports how fast the model runs
+against realtime and how far its output is from the recorded amp.
+
+Two model families are supported:
+
+- WindowedModel: Keras Sequential captures (GuitarLSTM's conv1d + conv1d +
+  LSTM + dense, or plain dense stacks) that map the last input_size input
+  samples to one output sample. The only state is the input history, so a
+  block is input_size-sample windows for every output sample, run through
+  the layers as batched matmuls (convolutions as strided patches times a
+  flattened kernel, the LSTM over the few conv steps with the whole block
+  as its batch).
+- RecurrentModel: sample-level LSTM captures exported as JSON with a
+  model_data / state_dict layout (Automated-GuitarAmpModelling, NeuralPi,
+  Proteus). h and c are carried between blocks; the input projection and
+  the readout are one matmul per block, only the recurrence is per sample.
+
+Everything runs in float32 with buffers allocated once per block size.
+A per-sample recurrence in NumPy is dominated by call overhead, so a long
+file can also be split into several streams that run side by side as the
+batch dimension of every matmul. Each stream starts with a warm-up run
+over the audio before its segment, whose output is discarded; for windowed
+models a warm-up of input_size - 1 samples makes the result exact.
+"""
+import argparse
+import contextlib
+import json
+import os
+import time
+
+import numpy as np
+import soundfile as sf
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# === Activations, applied in place ===
+
+def _identity(x):
+    return x
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _tanh(x):
+    return np.tanh(x, out=x)
+
+
+def _sigmoid(x):
+    # 0.5 * tanh(0.5 x) + 0.5 without an exp() overflow for large inputs
+    x *= 0.5
+    np.tanh(x, out=x)
+    x *= 0.5
+    x += 0.5
+    return x
+
+
+def _hard_sigmoid(x):
+    x *= 0.2
+    x += 0.5
+    return np.clip(x, 0, 1, out=x)
+
+
+ACTIVATIONS = {
+    None: _identity,
+    "linear": _identity,
+    "relu": _relu,
+    "tanh": _tanh,
+    "sigmoid": _sigmoid,
+    "hard_sigmoid": _hard_sigmoid,
+}
+
+
+def _activation(name):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation {name!r}")
+    return ACTIVATIONS[name]
+
+
+# === Layers ===
+
+class Conv1D:
+    """Keras Conv1D over (batch, time, channels) as one matmul on strided patches"""
+
+    def __init__(self, kernel, bias=None, strides=1, padding="valid", activation=None):
+        self.kernel_size, channels, filters = kernel.shape
+        # Patches come out as (channel, tap), so flatten the kernel the same way
+        self.weights = np.ascontiguousarray(kernel.transpose(1, 0, 2).reshape(channels * self.kernel_size, filters),
+                                            dtype=np.float32)
+        self.bias = None if bias is None else np.asarray(bias, dtype=np.float32)
+        self.strides = strides
+        self.padding = padding
+        self.activation = _activation(activation)
+
+    def _pad(self, length):
+        k, s = self.kernel_size, self.strides
+        if self.padding == "same":
+            # TensorFlow puts the odd sample of padding on the right
+            total = max((-(-length // s) - 1) * s + k - length, 0)
+            return total // 2, total - total // 2
+        if self.padding == "causal":
+            return k - 1, 0
+        return 0, 0
+
+    def __call__(self, x):
+        left, right = self._pad(x.shape[1])
+        if left or right:
+            x = np.pad(x, ((0, 0), (left, right), (0, 0)))
+        patches = sliding_window_view(x, self.kernel_size, axis=1)[:, ::self.strides]
+        out = patches.reshape(len(x), patches.shape[1], -1) @ self.weights
+        if self.bias is not None:
+            out += self.bias
+        return self.activation(out)
+
+
+class Dense:
+    """Keras Dense on the last axis"""
+
+    def __init__(self, kernel, bias=None, activation=None):
+        self.weights = np.asarray(kernel, dtype=np.float32)
+        self.bias = None if bias is None else np.asarray(bias, dtype=np.float32)
+        self.activation = _activation(activation)
+
+    def __call__(self, x):
+        out = x @ self.weights
+        if self.bias is not None:
+            out += self.bias
+        return self.activation(out)
+
+
+class Flatten:
+    def __call__(self, x):
+        return x.reshape(len(x), -1)
+
+
+class LSTMCell:
+    """One LSTM layer's weights and per-step update
+
+    Weights come in as w_ih (inputs, 4 * units) and w_hh (units, 4 * units)
+    and are stored transposed, with the gates reordered to (input, forget,
+    output, candidate). States are feature-major, (units, batch), so every
+    gate is a contiguous row block of the (4 * units, batch) gate array and
+    the three sigmoid gates are one slice. With the usual sigmoid / tanh
+    pair the sigmoid gates' rows are pre-scaled by 0.5, which turns every
+    activation of a step into a single tanh over all gates:
+    sigmoid(z) = 0.5 * tanh(z / 2) + 0.5.
+    """
+
+    def __init__(self, w_ih, w_hh, bias, order, activation="tanh", recurrent_activation="sigmoid"):
+        units = w_hh.shape[0]
+        self.units = units
+        blocks = [np.arange(g * units, (g + 1) * units) for g in range(4)]
+        rows = np.concatenate([blocks[g] for g in order])
+        w_ih = np.asarray(w_ih, dtype=np.float32).T[rows]
+        w_hh = np.asarray(w_hh, dtype=np.float32).T[rows]
+        bias = np.zeros(4 * units, dtype=np.float32) if bias is None else np.asarray(bias, dtype=np.float32)[rows]
+
+        self.fused = activation == "tanh" and recurrent_activation == "sigmoid"
+        if self.fused:
+            scale = np.ones(4 * units, dtype=np.float32)
+            scale[:3 * units] = 0.5
+            w_ih, w_hh, bias = w_ih * scale[:, None], w_hh * scale[:, None], bias * scale
+        self.w_ih = np.ascontiguousarray(w_ih)
+        self.w_hh = np.ascontiguousarray(w_hh)
+        self.bias = bias[:, None]
+        self.activation = _activation(activation)
+        self.recurrent_activation = _activation(recurrent_activation)
+
+    def project(self, x, out=None):
+        """Input contribution to the gates for every step at once
+
+        x is (steps, inputs, batch); the result is (steps, 4 * units, batch).
+        """
+        out = np.matmul(self.w_ih, x, out=out)
+        out += self.bias
+        return out
+
+    def run(self, inputs, h, c, gates, outputs=None):
+        """Step over projected inputs (steps, 4 * units, batch)
+
+        h and c (units, batch) are updated in place. If outputs
+        (steps, units, batch) is given, every step's h is written there.
+        """
+        u = self.units
+        forget, output = gates[u:2 * u], gates[2 * u:3 * u]
+        input_gate, sigmoid_gates, candidate = gates[:u], gates[:3 * u], gates[3 * u:]
+        w_hh = self.w_hh
+        h_prev = h
+        for t in range(len(inputs)):
+            np.dot(w_hh, h_prev, out=gates)
+            gates += inputs[t]
+            if self.fused:
+                np.tanh(gates, out=gates)
+                sigmoid_gates *= 0.5
+                sigmoid_gates += 0.5
+            else:
+                self.recurrent_activation(sigmoid_gates)
+                self.activation(candidate)
+            c *= forget
+            candidate *= input_gate
+            c += candidate
+            h_next = h if outputs is None else outputs[t]
+            if self.fused:
+                np.tanh(c, out=h_next)
+            else:
+                np.copyto(h_next, c)
+                self.activation(h_next)
+            h_next *= output
+            h_prev = h_next
+        if outputs is not None and len(inputs):
+            h[...] = outputs[-1]
+        return h
+
+
+# Source gate orders, mapped to (input, forget, output, candidate)
+KERAS_GATES = (0, 1, 3, 2)     # i, f, c, o
+TORCH_GATES = (0, 1, 3, 2)     # i, f, g, o
+
+
+class LSTM:
+    """Keras LSTM over (batch, time, features), starting from zero state"""
+
+    def __init__(self, kernel, recurrent_kernel, bias=None, activation="tanh",
+                 recurrent_activation="sigmoid", return_sequences=False):
+        self.cell = LSTMCell(kernel, recurrent_kernel, bias, KERAS_GATES, activation, recurrent_activation)
+        self.return_sequences = return_sequences
+
+    def __call__(self, x):
+        batch, steps, _ = x.shape
+        units = self.cell.units
+        inputs = self.cell.project(x.transpose(1, 2, 0))
+        h = np.zeros((units, batch), dtype=np.float32)
+        c = np.zeros((units, batch), dtype=np.float32)
+        gates = np.empty((4 * units, batch), dtype=np.float32)
+        if self.return_sequences:
+            outputs = np.empty((steps, units, batch), dtype=np.float32)
+            self.cell.run(inputs, h, c, gates, outputs)
+            return outputs.transpose(2, 0, 1)
+        return self.cell.run(inputs, h, c, gates).T
+
+
+# === Models ===
+
+class WindowedModel:
+    """Maps the last input_size samples to one output sample (GuitarLSTM style)
+
+    `layers` are called in order on (windows, input_size, 1) arrays, or on
+    (windows, input_size) for dense-only models (sequence_input=False).
+    Windows are evaluated max_batch at a time so the intermediate arrays
+    stay small. The first input_size - 1 outputs see zeros before the
+    signal, like GuitarLSTM's predict.py padding.
+    """
+
+    def __init__(self, layers, input_size, sequence_input=True, max_batch=1024):
+        self.layers = layers
+        self.input_size = input_size
+        self.sequence_input = sequence_input
+        self.max_batch = max_batch
+        # Samples of history that make a stream's output exact
+        self.receptive_field = input_size - 1
+        self.reset()
+
+    def reset(self, streams=1):
+        self.streams = streams
+        self.history = np.zeros((streams, self.input_size - 1), dtype=np.float32)
+        self._signal = None
+
+    def process(self, block):
+        """(streams, samples) float32 -> (streams, samples) float32"""
+        streams, n = block.shape
+        keep = self.input_size - 1
+        if self._signal is None or self._signal.shape[1] != keep + n:
+            self._signal = np.empty((streams, keep + n), dtype=np.float32)
+            self._output = np.empty(streams * n, dtype=np.float32)
+        signal = self._signal
+        signal[:, :keep] = self.history
+        signal[:, keep:] = block
+        windows = sliding_window_view(signal, self.input_size, axis=1)
+
+        output = self._output
+        rows_per_stream = max(1, self.max_batch // streams)
+        for start in range(0, n, rows_per_stream):
+            end = min(n, start + rows_per_stream)
+            x = windows[:, start:end].reshape(-1, self.input_size)
+            if self.sequence_input:
+                x = x[:, :, None]
+            for layer in self.layers:
+                x = layer(x)
+            y = x.reshape(streams, end - start, -1)[:, :, -1]
+            output.reshape(streams, n)[:, start:end] = y
+
+        self.history[...] = signal[:, n:]
+        return output.reshape(streams, n)
+
+
+class RecurrentModel:
+    """Sample-level LSTM with a linear readout, carried across blocks
+
+    Stacked layers run one after the other over the whole block, each
+    feeding its output sequence to the next. `skip` adds the input to the
+    output (the models learn the difference from the DI). Conditioning
+    inputs (knob settings beyond the audio input) are held constant, so
+    they are folded into the first layer's bias.
+    """
+
+    def __init__(self, cells, readout_weight, readout_bias=0.0, skip=False):
+        self.cells = cells
+        self.readout_weight = np.asarray(readout_weight, dtype=np.float32).reshape(-1)
+        self.readout_bias = np.float32(readout_bias)
+        self.skip = skip
+        # The state never fully forgets, so no warm-up length is exact
+        self.receptive_field = None
+        self.reset()
+
+    def reset(self, streams=1):
+        self.streams = streams
+        self.h = [np.zeros((cell.units, streams), dtype=np.float32) for cell in self.cells]
+        self.c = [np.zeros((cell.units, streams), dtype=np.float32) for cell in self.cells]
+        self.gates = [np.empty((4 * cell.units, streams), dtype=np.float32) for cell in self.cells]
+        self._block_size = None
+
+    def _allocate(self, n):
+        s = self.streams
+        self._inputs = [np.empty((n, 4 * cell.units, s), dtype=np.float32) for cell in self.cells]
+        self._outputs = [np.empty((n, cell.units, s), dtype=np.float32) for cell in self.cells]
+        self._result = np.empty((n, s), dtype=np.float32)
+        self._block_size = n
+
+    def process(self, block):
+        """(streams, samples) float32 -> (streams, samples) float32"""
+        n = block.shape[1]
+        if self._block_size != n:
+            self._allocate(n)
+        layer_input = block.T[:, None, :]
+        for i, cell in enumerate(self.cells):
+            inputs = cell.project(layer_input, out=self._inputs[i])
+            cell.run(inputs, self.h[i], self.c[i], self.gates[i], self._outputs[i])
+            layer_input = self._outputs[i]
+
+        result = np.matmul(self.readout_weight, layer_input, out=self._result)
+        result += self.readout_bias
+        if self.skip:
+            result += block.T
+        return result.T
+
+
+# === Loading ===
+
+def load_recurrent_json(path, conditioning=()):
+    """RecurrentModel from a {"model_data": ..., "state_dict": ...} JSON export
+
+    state_dict holds PyTorch names: rec.weight_ih_l{k}, rec.weight_hh_l{k},
+    rec.bias_ih_l{k}, rec.bias_hh_l{k}, lin.weight, lin.bias. Models with
+    input_size > 1 need one conditioning value per extra input.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    model_data, state = data["model_data"], data["state_dict"]
+    unit_type = model_data.get("unit_type", "LSTM")
+    if unit_type != "LSTM":
+        raise ValueError(f"Unsupported unit_type {unit_type!r}, only LSTM models can be loaded")
+    input_size = model_data.get("input_size", 1)
+    if len(conditioning) != input_size - 1:
+        raise ValueError(f"{path} has {input_size - 1} conditioning inputs, got {len(conditioning)} values")
+
+    cells = []
+    for layer in range(model_data.get("num_layers", 1)):
+        w_ih = np.array(state[f"rec.weight_ih_l{layer}"], dtype=np.float32).T
+        w_hh = np.array(state[f"rec.weight_hh_l{layer}"], dtype=np.float32).T
+        bias = np.zeros(w_hh.shape[1], dtype=np.float32)
+        for name in (f"rec.bias_ih_l{layer}", f"rec.bias_hh_l{layer}"):
+            if name in state:
+                bias += np.array(state[name], dtype=np.float32)
+        if layer == 0 and input_size > 1:
+            bias += np.asarray(conditioning, dtype=np.float32) @ w_ih[1:]
+            w_ih = w_ih[:1]
+        cells.append(LSTMCell(w_ih, w_hh, bias, TORCH_GATES))
+
+    readout_weight = np.array(state["lin.weight"], dtype=np.float32)
+    readout_bias = np.array(state.get("lin.bias", [0.0]), dtype=np.float32).reshape(-1)[0]
+    return RecurrentModel(cells, readout_weight, readout_bias, skip=bool(model_data.get("skip", 0)))
+
+
+def _keras_layer(class_name, config, weights):
+    if class_name == "Conv1D":
+        if tuple(config.get("dilation_rate", (1,))) != (1,):
+            raise ValueError("Dilated Conv1D layers are not supported")
+        return Conv1D(weights[0], weights[1] if config.get("use_bias", True) else None,
+                      strides=config["strides"][0], padding=config["padding"],
+                      activation=config.get("activation"))
+    if class_name == "LSTM":
+        if config.get("go_backwards"):
+            raise ValueError("Backwards LSTM layers are not supported")
+        return LSTM(weights[0], weights[1], weights[2] if config.get("use_bias", True) else None,
+                    activation=config.get("activation", "tanh"),
+                    recurrent_activation=config.get("recurrent_activation", "sigmoid"),
+                    return_sequences=config.get("return_sequences", False))
+    if class_name == "Dense":
+        return Dense(weights[0], weights[1] if config.get("use_bias", True) else None,
+                     activation=config.get("activation"))
+    if class_name == "Flatten":
+        return Flatten()
+    if class_name in ("Dropout", "InputLayer"):
+        return None
+    raise ValueError(f"Unsupported layer {class_name}")
+
+
+def load_keras_h5(path, max_batch=1024):
+    """WindowedModel from a Keras .h5 model save (as written by GuitarLSTM's train.py)
+
+    The model must be a plain chain of Conv1D, LSTM, Dense, Flatten and
+    Dropout layers whose input is a window of samples. Needs h5py.
+    """
+    try:
+        import h5py
+    except ImportError as e:
+        raise ImportError("Loading Keras .h5 models needs h5py (pip install h5py)") from e
+
+    with h5py.File(path, "r") as f:
+        if "model_config" not in f.attrs:
+            raise ValueError(f"{path} has no model_config; weights-only saves cannot be loaded")
+        model_config = f.attrs["model_config"]
+        if isinstance(model_config, bytes):
+            model_config = model_config.decode()
+        config = json.loads(model_config)["config"]
+        layer_configs = config["layers"] if isinstance(config, dict) else config
+        weight_root = f["model_weights"] if "model_weights" in f else f
+
+        layers, input_shape = [], None
+        for layer_config in layer_configs:
+            class_name, cfg = layer_config["class_name"], layer_config["config"]
+            shape = cfg.get("batch_input_shape") or cfg.get("batch_shape")
+            if input_shape is None and shape is not None:
+                input_shape = shape
+            weights = []
+            if cfg["name"] in weight_root:
+                group = weight_root[cfg["name"]]
+                for name in group.attrs.get("weight_names", []):
+                    name = name.decode() if isinstance(name, bytes) else name
+                    weights.append(np.asarray(group[name]))
+            layer = _keras_layer(class_name, cfg, weights)
+            if layer is not None:
+                layers.append(layer)
+
+    if input_shape is None or input_shape[1] is None:
+        raise ValueError(f"{path} does not record a fixed input window size")
+    return WindowedModel(layers, int(input_shape[1]), sequence_input=len(input_shape) == 3,
+                         max_batch=max_batch)
+
+
+def load_model(path, conditioning=()):
+    """WindowedModel for Keras .h5 files, RecurrentModel for JSON exports"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".h5", ".hdf5"):
+        if conditioning:
+            raise ValueError("Keras window models take no conditioning values")
+        return load_keras_h5(path)
+    if extension == ".json":
+        return load_recurrent_json(path, conditioning)
+    raise ValueError(f"Unknown model format {extension!r}, expected .h5 or .json")
+
+
+# === Streaming over files ===
+
+def file_peak(path, block_size=2 ** 16):
+    """Peak of the mono mix, read block by block"""
+    peak = 0.0
+    for block in sf.blocks(path, blocksize=block_size, dtype="float32", always_2d=True):
+        mono = block.mean(axis=1)
+        if len(mono):
+            peak = max(peak, float(np.abs(mono).max()))
+    return peak
+
+
+class _Segment:
+    """One stream's part of the file: warm-up from `begin`, scored from `start` to `end`"""
+
+    def __init__(self, stack, di_path, target_path, start, end, warmup):
+        self.begin = max(0, start - warmup)
+        self.start = start
+        self.end = end
+        self.position = self.begin
+        self.reader = stack.enter_context(sf.SoundFile(di_path))
+        self.reader.seek(self.begin)
+        self.target = None
+        if target_path is not None:
+            self.target = stack.enter_context(sf.SoundFile(target_path))
+            self.target.seek(min(start, self.target.frames))
+
+    def read(self, count):
+        return self.reader.read(count, dtype="float32", always_2d=True).mean(axis=1)
+
+
+def _create_output(path, frames, fs, block_size=2 ** 16):
+    """Zero-filled float WAV opened for random-access writes by the streams"""
+    with sf.SoundFile(path, "w", fs, 1, subtype="FLOAT") as f:
+        zeros = np.zeros(block_size, dtype=np.float32)
+        for start in range(0, frames, block_size):
+            f.write(zeros[:min(block_size, frames - start)])
+    return sf.SoundFile(path, "r+")
+
+
+def stream_file(model, di_path, target_path=None, output_path=None, block_size=4096,
+                streams=1, warmup=None, normalize=False):
+    """Run the model over a DI file block by block and score it against the target
+
+    The file is split into `streams` segments that are processed side by
+    side, each preceded by `warmup` samples (default: the model's receptive
+    field, or 0.5 s for recurrent models). Only model calls are timed;
+    realtime_factor is audio seconds per compute second, and the deadline
+    stats are per block call as in realtime_guitar.run_offline. With a
+    target, error_db is the error energy relative to the target
+    (error-to-signal ratio, ESR) over the frames both files cover.
+    normalize peak-normalizes DI and target first, as GuitarLSTM's
+    training does.
+    """
+    info = sf.info(di_path)
+    fs, frames = info.samplerate, info.frames
+    if target_path is not None and sf.info(target_path).samplerate != fs:
+        raise ValueError(f"{di_path} and {target_path} have different sample rates")
+    if warmup is None:
+        warmup = model.receptive_field if model.receptive_field is not None else fs // 2
+    streams = max(1, min(streams, frames // block_size or 1))
+
+    input_gain = target_gain = 1.0
+    if normalize:
+        input_gain = 1.0 / (file_peak(di_path) or 1.0)
+        if target_path is not None:
+            target_gain = 1.0 / (file_peak(target_path) or 1.0)
+
+    bounds = np.linspace(0, frames, streams + 1).astype(int)
+    model.reset(streams)
+    batch = np.zeros((streams, block_size), dtype=np.float32)
+    block_times = []
+    target_energy = error_energy = 0.0
+    scored_frames = 0
+
+    wall_start = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        segments = [_Segment(stack, di_path, target_path, bounds[i], bounds[i + 1], warmup)
+                    for i in range(streams)]
+        output = None
+        if output_path is not None:
+            output = stack.enter_context(_create_output(output_path, frames, fs))
+
+        while any(s.position < s.end for s in segments):
+            counts = []
+            for row, segment in zip(batch, segments):
+                count = max(0, min(block_size, segment.end - segment.position))
+                if count:
+                    row[:count] = segment.read(count)
+                row[count:] = 0
+                counts.append(count)
+            if input_gain != 1.0:
+                batch *= input_gain
+
+            t0 = time.perf_counter()
+            result = model.process(batch)
+            block_times.append(time.perf_counter() - t0)
+
+            for row, segment, count in zip(result, segments, counts):
+                # Skip the warm-up part of the block
+                skip = min(count, max(0, segment.start - segment.position))
+                scored = row[skip:count]
+                if len(scored) and output is not None:
+                    output.seek(segment.position + skip)
+                    output.write(scored)
+                if len(scored) and segment.target is not None:
+                    target = segment.target.read(len(scored), dtype="float32", always_2d=True).mean(axis=1)
+                    target = target.astype(np.float64) * target_gain
+                    error = target - scored[:len(target)]
+                    target_energy += float(np.dot(target, target))
+                    error_energy += float(np.dot(error, error))
+                    scored_frames += len(target)
+                segment.position += count
+    wall_seconds = time.perf_counter() - wall_start
+
+    block_times = np.array(block_times)
+    compute_seconds = block_times.sum()
+    deadline = block_size / fs
+    stats = {
+        "frames": frames,
+        "audio_seconds": frames / fs,
+        "block_size": block_size,
+        "streams": streams,
+        "warmup": warmup,
+        "compute_seconds": compute_seconds,
+        "wall_seconds": wall_seconds,
+        "realtime_factor": frames / fs / compute_seconds if compute_seconds > 0 else np.inf,
+        "deadline_ms": deadline * 1000,
+        "worst_block_ms": block_times.max() * 1000,
+        "mean_block_ms": block_times.mean() * 1000,
+        "missed_deadlines": int(np.sum(block_times > deadline)),
+        "worst_case_load": block_times.max() / deadline,
+    }
+    if target_path is not None:
+        esr = error_energy / target_energy if target_energy > 0 else np.inf
+        stats.update({
+            "scored_frames": scored_frames,
+            "esr": esr,
+            "error_db": 10 * np.log10(esr) if esr > 0 else -np.inf,
+        })
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a captured amp model over a DI file and score it")
+    parser.add_argument("model", help="Keras .h5 save (GuitarLSTM) or JSON LSTM export")
+    parser.add_argument("di", help="DI input, e.g. train_x.wav")
+    parser.add_argument("--target", help="recorded amp output to compare against, e.g. train_y.wav")
+    parser.add_argument("--output", help="write the model output to this WAV file")
+    parser.add_argument("--block-size", type=int, default=4096)
+    parser.add_argument("--streams", type=int, default=1,
+                        help="segments of the file processed side by side as one batch")
+    parser.add_argument("--warmup", type=int, default=None, help="warm-up samples before each segment")
+    parser.add_argument("--normalize", action="store_true",
+                        help="peak-normalize DI and target first (GuitarLSTM models)")
+    parser.add_argument("--condition", type=float, nargs="*", default=[],
+                        help="constant conditioning inputs (knob values) for JSON models")
+    args = parser.parse_args()
+
+    model = load_model(args.model, args.condition)
+    stats = stream_file(model, args.di, args.target, args.output, args.block_size,
+                        args.streams, args.warmup, args.normalize)
+
+    print(f"{stats['audio_seconds']:.1f} s of audio in {stats['compute_seconds']:.2f} s "
+          f"({stats['realtime_factor']:.2f}x realtime, {stats['streams']} stream(s))")
+    print(f"Blocks of {stats['block_size']}: worst {stats['worst_block_ms']:.2f} ms, "
+          f"mean {stats['mean_block_ms']:.2f} ms, deadline {stats['deadline_ms']:.2f} ms, "
+          f"{stats['missed_deadlines']} missed")
+    if "esr" in stats:
+        print(f"Error vs {args.target}: ESR {stats['esr']:.4f} ({stats['error_db']:.1f} dB)")
+    if args.output:
+        print(f"Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,545 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+import warnings
+from math import gcd
+
+import numpy as np
+import soundfile as sf
+from scipy.ndimage import median_filter
+from scipy.signal import resample_poly
+
+
+# Frequency bands (Hz) used for per-band decay rates
+BANDS = [(0, 250), (250, 1000), (1000, 4000), (4000, None)]
+
+# A spectral peak counts when it is a local maximum this far above the
+# running median around it (PEAK_FLOOR_HZ wide), and no more than
+# PEAK_RANGE_DB below the clip's strongest bin. Flat spectra (silence,
+# or numerical noise under a pure tone) therefore have no peaks.
+PEAK_PROMINENCE_DB = 6.0
+PEAK_RANGE_DB = 60.0
+PEAK_FLOOR_HZ = 875.0
+
+# Bumped when a feature's definition changes, so cached values are not reused
+FEATURES_VERSION = 2
+
+
+class FileClip:
+    """An audio file read as mono blocks at the extractor's sample rate
+
+    Passed to FeatureExtractor.extract in place of an array, so a long file
+    is never decoded whole. Other sample rates go through resample_poly in
+    overlapping segments whose margins cover the filter, which gives the
+    same samples as resampling the whole file.
+    """
+
+    def __init__(self, path, fs, block_size=2 ** 16):
+        self.path = path
+        self.block_size = block_size
+        info = sf.info(path)
+        self.file_frames = info.frames
+        divisor = gcd(fs, info.samplerate)
+        self.up, self.down = fs // divisor, info.samplerate // divisor
+        self.length = -(-self.file_frames * self.up // self.down)
+
+    def __len__(self):
+        return self.length
+
+    def key(self):
+        stat = os.stat(self.path)
+        return os.path.abspath(self.path), stat.st_mtime, stat.st_size
+
+    def blocks(self):
+        with sf.SoundFile(self.path) as f:
+            raw = (block.mean(axis=1) for block in f.blocks(self.block_size, dtype="float64", always_2d=True))
+            if self.up == self.down:
+                yield from raw
+            else:
+                yield from self._resampled(raw)
+
+    def _resampled(self, raw):
+        up, down, n = self.up, self.down, self.file_frames
+        # Segment edges on multiples of `down` land on whole output samples
+        margin = down * -(-(10 * max(up, down) // up + 2) // down)
+        step = down * max(1, self.block_size // down)
+        buffer, buffer_start = np.zeros(0), 0
+        for start in range(0, n, step):
+            stop = min(start + step, n)
+            low, high = max(0, start - margin), min(n, stop + margin)
+            while buffer_start + len(buffer) < high:
+                block = next(raw, None)
+                if block is None:
+                    break
+                buffer = np.concatenate([buffer, block])
+            resampled = resample_poly(buffer[low - buffer_start:high - buffer_start], up, down)
+            first = (start - low) * up // down
+            yield resampled[first:first + -(-stop * up // down) - start * up // down]
+
+            keep = max(0, stop - margin)
+            buffer, buffer_start = buffer[keep - buffer_start:], keep
+
+
+def _clip_blocks(clip):
+    return clip.blocks() if isinstance(clip, FileClip) else (clip,)
+
+
+class _FrameReader:
+    """STFT frames of a clip taken from its blocks in order
+
+    Keeps only the samples that later frames still need.
+    """
+
+    def __init__(self, clip, frame_size, hop):
+        self.blocks = iter(_clip_blocks(clip))
+        self.frame_size = frame_size
+        self.hop = hop
+        self.buffer = np.zeros(0)
+        self.start = 0
+
+    def read(self, first, count, out):
+        """Frames first..first+count-1 into out[:count], zero-padded past the end"""
+        begin = first * self.hop
+        end = (first + count - 1) * self.hop + self.frame_size
+        while self.start + len(self.buffer) < end:
+            block = next(self.blocks, None)
+            if block is None:
+                break
+            self.buffer = np.concatenate([self.buffer, block]) if len(self.buffer) else block
+        samples = self.buffer[begin - self.start:end - self.start]
+        if len(samples) < end - begin:
+            samples = np.concatenate([samples, np.zeros(end - begin - len(samples))])
+        out[:count] = np.lib.stride_tricks.sliding_window_view(samples, self.frame_size)[::self.hop][:count]
+
+        drop = (first + count) * self.hop - self.start
+        self.buffer = self.buffer[drop:]
+        self.start += drop
+
+
+class FeatureExtractor:
+    """Batched features for comparing synthetic and natural guitar notes
+
+    Clips are processed in batches; all features share one set of STFT
+    frames, and each chunk of frames is transformed with a single batched
+    rfft over (clips, frames, samples). Every per-frame statistic is
+    reduced into running sums, so memory depends on batch_size and
+    max_chunk_bytes but not on clip length; clips given as FileClip are
+    also read block by block.
+
+    Features per clip:
+      attack_peak_time    seconds from clip start to the largest |sample|
+                          within the first attack_window seconds
+      decay_rate          (len(BANDS),) band energy decay after the peak, dB/s
+      spectral_centroid   energy-weighted mean of the frame centroids, Hz
+      spectral_rolloff    energy-weighted mean of the frame rolloffs, Hz
+      fundamental         f0 of the line fit over the harmonic peaks, Hz
+      harmonic_amplitudes (n_harmonics,) peaks at n*f0 in dB re the fundamental
+
+    Spectral features are NaN when the clip has no qualifying peaks (for
+    example silence); so are harmonics whose window holds none.
+      inharmonicity       B in f_n = n*f0*sqrt(1 + B*n**2), line fit over harmonics
+      peak_asymmetry      max(x) / -min(x) (natural reference: 0.715/0.515)
+    """
+
+    def __init__(self, fs=44100, frame_size=4096, hop=1024, n_harmonics=8, bands=BANDS,
+                 rolloff=0.85, attack_window=0.1, floor_db=-80.0, batch_size=256,
+                 max_chunk_bytes=64 * 2 ** 20, cache_path=None):
+        self.fs = fs
+        self.frame_size = frame_size
+        self.hop = hop
+        self.n_harmonics = n_harmonics
+        self.bands = bands
+        self.rolloff = rolloff
+        self.attack_window = attack_window
+        self.floor_db = floor_db
+        self.batch_size = batch_size
+        self.max_chunk_bytes = max_chunk_bytes
+
+        self.window = np.hanning(frame_size)
+        self.freqs = np.fft.rfftfreq(frame_size, 1 / fs)
+        self.band_matrix = np.stack([
+            (self.freqs >= low) & (self.freqs < (high or np.inf)) for low, high in bands
+        ], axis=1).astype(float)
+
+        self.cache_path = cache_path
+        self.cache = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path) as f:
+                self.cache = json.load(f)
+
+    def _settings(self):
+        return (self.fs, self.frame_size, self.hop, self.n_harmonics, tuple(self.bands),
+                self.rolloff, self.attack_window, self.floor_db, FEATURES_VERSION)
+
+    def clip_hash(self, clip, fundamental_freq=None):
+        if isinstance(clip, FileClip):
+            # Hashing the samples would mean decoding the file; path, mtime and size stand in
+            h = hashlib.sha1(repr(clip.key()).encode())
+            h.update(repr((fundamental_freq, self._settings())).encode())
+        else:
+            h = hashlib.sha1(np.ascontiguousarray(clip).view(np.uint8))
+            h.update(repr((clip.dtype.str, fundamental_freq, self._settings())).encode())
+        return h.hexdigest()
+
+    def extract(self, clips, fundamental_freqs=None, save=True):
+        """Features for a list of 1-D clips or FileClips, as {name: array over clips}
+
+        fundamental_freqs (one per clip, or None) locates the harmonics;
+        when missing, f0 is estimated from the long-term spectrum. Callers
+        feeding many small batches can pass save=False and call
+        save_cache() once at the end.
+        """
+        if fundamental_freqs is None:
+            fundamental_freqs = [None] * len(clips)
+        keys = [self.clip_hash(c, f) for c, f in zip(clips, fundamental_freqs)]
+
+        todo = [i for i, k in enumerate(keys) if k not in self.cache]
+        for start in range(0, len(todo), self.batch_size):
+            batch = todo[start:start + self.batch_size]
+            results = self._extract_batch([clips[i] for i in batch], [fundamental_freqs[i] for i in batch])
+            for i, result in zip(batch, results):
+                self.cache[keys[i]] = result
+        if todo and save:
+            self.save_cache()
+
+        rows = [self.cache[k] for k in keys]
+        return {name: np.array([row[name] for row in rows]) for name in rows[0]} if rows else {}
+
+    def save_cache(self):
+        if self.cache_path:
+            with open(self.cache_path, "w") as f:
+                json.dump(self.cache, f)
+
+    def _extract_batch(self, clips, fundamental_freqs):
+        num_clips = len(clips)
+        num_bins = len(self.freqs)
+        eps = 1e-20
+
+        # --- Time-domain features, one O(N) pass per clip ---
+        attack_samples = int(self.attack_window * self.fs)
+        peaks = np.zeros(num_clips)
+        attack_peak = np.zeros(num_clips, dtype=int)
+        asymmetry = np.full(num_clips, np.nan)
+        for i, clip in enumerate(clips):
+            position, attack_level, high, low = 0, -1.0, -np.inf, np.inf
+            for block in _clip_blocks(clip):
+                if len(block) == 0:
+                    continue
+                peaks[i] = max(peaks[i], np.max(np.abs(block)))
+                high, low = max(high, block.max()), min(low, block.min())
+                if position < attack_samples:
+                    head = np.abs(block[:attack_samples - position])
+                    j = np.argmax(head)
+                    if head[j] > attack_level:
+                        attack_level, attack_peak[i] = head[j], position + j
+                position += len(block)
+            if low < 0:
+                asymmetry[i] = high / -low
+
+        # --- Shared STFT frames in fixed-size chunks ---
+        clip_frames = np.array([1 + max(0, (len(c) - self.frame_size) // self.hop) for c in clips])
+        total_frames = clip_frames.max()
+        chunk = max(1, self.max_chunk_bytes // (num_clips * self.frame_size * 8 * 4))
+        buffer = np.zeros((num_clips, min(chunk, total_frames), self.frame_size))
+        readers = [_FrameReader(c, self.frame_size, self.hop) for c in clips]
+
+        spectrum_sum = np.zeros((num_clips, num_bins))
+        centroid_sum = np.zeros(num_clips)
+        rolloff_sum = np.zeros(num_clips)
+        energy_sum = np.zeros(num_clips)
+
+        # Running least-squares sums for the band decay slopes
+        num_bands = len(self.bands)
+        n, st, stt, sy, sty = (np.zeros((num_clips, num_bands)) for _ in range(5))
+        peak_frame = attack_peak // self.hop
+        reference_db = 10 * np.log10(peaks ** 2 * np.sum(self.window) ** 2 + eps)
+
+        for first in range(0, total_frames, chunk):
+            count = min(chunk, total_frames - first)
+            frames = buffer[:, :count]
+            frames[:] = 0.0
+            for i, reader in enumerate(readers):
+                if first < clip_frames[i]:
+                    reader.read(first, min(count, clip_frames[i] - first), frames[i])
+
+            power = np.abs(np.fft.rfft(frames * self.window, axis=-1)) ** 2
+            spectrum_sum += np.sqrt(power).sum(axis=1)
+
+            frame_energy = power.sum(axis=-1)
+            centroid = power @ self.freqs / (frame_energy + eps)
+            cumulative = np.cumsum(power, axis=-1)
+            rolloff_bin = np.argmax(cumulative >= self.rolloff * frame_energy[..., None], axis=-1)
+            centroid_sum += np.sum(centroid * frame_energy, axis=1)
+            rolloff_sum += np.sum(self.freqs[rolloff_bin] * frame_energy, axis=1)
+            energy_sum += frame_energy.sum(axis=1)
+
+            frame_index = np.arange(first, first + count)
+            t = (frame_index * self.hop + self.frame_size / 2) / self.fs
+            band_db = 10 * np.log10(power @ self.band_matrix + eps) - reference_db[:, None, None]
+            use = ((frame_index[None, :] >= peak_frame[:, None])
+                   & (frame_index[None, :] < clip_frames[:, None]))[..., None] & (band_db > self.floor_db)
+            tb = np.broadcast_to(t[None, :, None], band_db.shape)
+            n += use.sum(axis=1)
+            st += np.sum(tb * use, axis=1)
+            stt += np.sum(tb ** 2 * use, axis=1)
+            sy += np.sum(band_db * use, axis=1)
+            sty += np.sum(tb * band_db * use, axis=1)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = (n * sty - st * sy) / (n * stt - st ** 2)
+        decay_rate = np.where(n >= 3, -slope, np.nan)
+
+        spectrum = spectrum_sum / clip_frames[:, None]
+        fundamental, harmonic_db, inharmonicity = self._harmonics(spectrum, fundamental_freqs)
+
+        results = []
+        for i in range(num_clips):
+            results.append({
+                "attack_peak_time": float(attack_peak[i] / self.fs),
+                "decay_rate": decay_rate[i].tolist(),
+                "spectral_centroid": float(centroid_sum[i] / (energy_sum[i] + eps)),
+                "spectral_rolloff": float(rolloff_sum[i] / (energy_sum[i] + eps)),
+                "fundamental": float(fundamental[i]),
+                "harmonic_amplitudes": harmonic_db[i].tolist(),
+                "inharmonicity": float(inharmonicity[i]),
+                "peak_asymmetry": float(asymmetry[i]),
+            })
+        return results
+
+    def _peaks(self, spectrum):
+        """Level in dB, peak prominence (0 off peaks), and each bin's interpolated peak frequency and level"""
+        level_db = 20 * np.log10(spectrum + 1e-12)
+        level_db = np.maximum(level_db, level_db.max(axis=1, keepdims=True) - PEAK_RANGE_DB)
+        floor_bins = 2 * int(PEAK_FLOOR_HZ / self.freqs[1] / 2) + 1
+        prominence = level_db - median_filter(level_db, size=(1, floor_bins), mode="nearest")
+
+        a, b, c = level_db[:, :-2], level_db[:, 1:-1], level_db[:, 2:]
+        is_peak = np.zeros(level_db.shape, dtype=bool)
+        is_peak[:, 1:-1] = (b > a) & (b >= c) & (prominence[:, 1:-1] >= PEAK_PROMINENCE_DB)
+        prominence = np.where(is_peak, prominence, 0.0)
+
+        # Parabolic interpolation of the log-magnitude peak
+        denom = a - 2 * b + c
+        offset = np.where(denom != 0, 0.5 * (a - c) / np.where(denom != 0, denom, 1), 0.0)
+        peak_freq = np.zeros(level_db.shape)
+        peak_freq[:, 1:-1] = (np.arange(1, level_db.shape[1] - 1) + offset) * self.freqs[1]
+        peak_db = level_db.copy()
+        peak_db[:, 1:-1] = b - 0.25 * (a - c) * offset
+        return level_db, prominence, peak_freq, peak_db
+
+    def _estimate_f0(self, spectrum, low=40.0, high=1000.0, harmonics=6, tolerance=0.8, steps_per_octave=96):
+        """f0 from a cosine harmonic template over the long-term spectral peaks
+
+        A candidate f scores sum(w * cos(2*pi * f_peak / f)) over the peaks
+        between f/2 and `harmonics` * f, weighted by their prominence, so
+        peaks on its harmonics add and peaks between them subtract. A
+        missing fundamental costs nothing, and candidates above f0 lose on
+        the odd harmonics. Sub-octaves of f0 match every peak too, so the
+        highest local maximum within `tolerance` of the best score is taken.
+        NaN for spectra without peaks.
+        """
+        _, prominence, peak_freq, _ = self._peaks(spectrum)
+        candidates = low * 2 ** (np.arange(int(np.log2(high / low) * steps_per_octave) + 1) / steps_per_octave)
+
+        f0 = np.full(len(spectrum), np.nan)
+        for i in range(len(spectrum)):
+            # Per clip, since the number of peaks differs
+            peaks = np.nonzero(prominence[i])[0]
+            ratio = peak_freq[i, peaks] / candidates[:, None]
+            inside = (ratio >= 0.5) & (ratio <= harmonics + 0.5)
+            score = np.sum(np.where(inside, prominence[i, peaks] * np.cos(2 * np.pi * ratio), 0.0), axis=1)
+            if not score.max(initial=0.0) > 0:
+                continue
+            padded = np.concatenate([[-np.inf], score, [-np.inf]])
+            local = (score >= padded[:-2]) & (score >= padded[2:])
+            f0[i] = candidates[np.nonzero(local & (score >= tolerance * score.max()))[0][-1]]
+        return f0
+
+    def _harmonics(self, spectrum, fundamental_freqs, tolerance=0.03):
+        """Peak frequency and level near each n*f0, vectorized over clips"""
+        f0 = np.array([np.nan if f is None else f for f in fundamental_freqs], dtype=float)
+        missing = np.isnan(f0)
+        if missing.any():
+            f0[missing] = self._estimate_f0(spectrum[missing])
+
+        level_db, prominence, peak_freqs, peak_levels = self._peaks(spectrum)
+        bin_width = self.freqs[1]
+        num_clips = len(f0)
+        rows = np.arange(num_clips)
+        peak_freq = np.full((num_clips, self.n_harmonics), np.nan)
+        peak_db = np.full((num_clips, self.n_harmonics), np.nan)
+
+        with np.errstate(invalid="ignore"):
+            for h in range(1, self.n_harmonics + 1):
+                low = h * f0 * (1 - tolerance) - bin_width
+                high = h * f0 * (1 + tolerance) + bin_width
+                # Only real peaks count, not the skirt of a neighbouring one
+                mask = (self.freqs >= low[:, None]) & (self.freqs <= high[:, None]) & (prominence > 0)
+                found = mask.any(axis=1) & (high < self.fs / 2)
+                idx = np.argmax(np.where(mask, level_db, -np.inf), axis=1)
+                peak_freq[found, h - 1] = peak_freqs[rows, idx][found]
+                peak_db[found, h - 1] = peak_levels[rows, idx][found]
+
+        # (f_n / n)**2 = f0**2 + f0**2 * B * n**2: line fit over the found
+        # harmonics, so B does not hinge on the fundamental's peak alone
+        n2 = np.arange(1, self.n_harmonics + 1) ** 2.0
+        y = (peak_freq / np.sqrt(n2)) ** 2
+        valid = ~np.isnan(y)
+        count = valid.sum(axis=1)
+        x = np.where(valid, n2, 0.0)
+        y = np.where(valid, y, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = (count * np.sum(x * y, axis=1) - x.sum(axis=1) * y.sum(axis=1)) / \
+                (count * np.sum(x ** 2, axis=1) - x.sum(axis=1) ** 2)
+            intercept = (y.sum(axis=1) - slope * x.sum(axis=1)) / count
+            inharmonicity = np.where(count >= 3, slope / intercept, np.nan)
+            # The fit's f0 holds when the fundamental itself is weak
+            fundamental = np.where(count >= 3, np.sqrt(np.abs(intercept)), peak_freq[:, 0])
+
+        # Relative to the fundamental's peak, or the level at f0 when it has none
+        at_f0 = np.array([np.interp(f, self.freqs, level) if np.isfinite(f) else np.nan
+                          for f, level in zip(fundamental, level_db)])
+        harmonic_db = peak_db - np.where(np.isnan(peak_db[:, 0]), at_f0, peak_db[:, 0])[:, None]
+        return fundamental, harmonic_db, inharmonicity
+
+
+def compare_features(generated, reference):
+    """Per-feature distribution comparison, as effect sizes against the reference
+
+    Returns rows of (feature, generated mean, reference mean, pooled std,
+    effect size) and the mean absolute effect size as an overall score.
+    """
+    rows = []
+    for name in reference:
+        gen = np.asarray(generated[name], dtype=float).reshape(len(generated[name]), -1)
+        ref = np.asarray(reference[name], dtype=float).reshape(len(reference[name]), -1)
+        for column in range(ref.shape[1]):
+            label = name if ref.shape[1] == 1 else f"{name}[{column}]"
+            with warnings.catch_warnings():
+                # Features missing for every clip (e.g. an empty band) come out as NaN
+                warnings.simplefilter("ignore", RuntimeWarning)
+                gen_mean = np.nanmean(gen[:, column])
+                ref_mean = np.nanmean(ref[:, column])
+                # Pooled standard deviation (Cohen's d)
+                pooled_std = np.sqrt((np.nanvar(gen[:, column]) + np.nanvar(ref[:, column])) / 2)
+            effect = (gen_mean - ref_mean) / pooled_std if pooled_std > 0 else np.nan
+            rows.append((label, gen_mean, ref_mean, pooled_std, effect))
+    score = np.nanmean([abs(row[4]) for row in rows])
+    return rows, score
+
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".aiff", ".aif", ".mp3")
+
+NOTE_SEMITONES = {"C": -9, "D": -7, "E": -5, "F": -4, "G": -2, "A": 0, "B": 2}
+
+
+def fundamental_from_name(path):
+    """f0 in Hz from a file name such as "E2_take3.wav", "A#1-mute.wav" or "82.41Hz.wav"
+
+    Tokens are split on "_", "-" and spaces; a number followed by
+    "Hz" wins over a note name (A4 = 440 Hz). Returns None when neither
+    is present.
+    """
+    tokens = re.split(r"[_\-\s]+", os.path.splitext(os.path.basename(path))[0])
+    for token in tokens:
+        match = re.fullmatch(r"(\d+(?:\.\d+)?)hz", token, re.IGNORECASE)
+        if match:
+            return float(match.group(1))
+    for token in tokens:
+        match = re.fullmatch(r"([A-G])([#b]?)(\d)", token)
+        if match:
+            letter, accidental, octave = match.groups()
+            semitone = NOTE_SEMITONES[letter] + {"#": 1, "b": -1, "": 0}[accidental] + 12 * (int(octave) - 4)
+            return 440.0 * 2 ** (semitone / 12)
+    return None
+
+
+def load_fundamentals(path):
+    """Per-file f0 from a JSON sidecar of {file name or path: Hz}"""
+    with open(path) as f:
+        return {name: float(freq) for name, freq in json.load(f).items()}
+
+
+def audio_files(folder):
+    """Paths of the audio files under folder, in a stable sorted order"""
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def iter_folder(folder, fs, batch_size=64, block_size=2 ** 16):
+    """(clips, paths) batches of FileClips for every audio file under folder
+
+    The files are only opened, block by block, when their features are
+    extracted, so memory does not depend on clip length.
+    """
+    clips, paths = [], []
+    for path in audio_files(folder):
+        clips.append(FileClip(path, fs, block_size))
+        paths.append(path)
+        if len(clips) == batch_size:
+            yield clips, paths
+            clips, paths = [], []
+    if clips:
+        yield clips, paths
+
+
+def extract_folder(extractor, folder, fundamentals=None, default_freq=None, batch_size=None):
+    """Features for every clip under folder, read and extracted one batch at a time
+
+    Each clip's f0 comes from fundamentals (keyed by path relative to
+    folder or bare file name), then its file name, then default_freq; clips
+    with none of these have f0 estimated.
+    """
+    fundamentals = fundamentals or {}
+    parts = []
+    for clips, paths in iter_folder(folder, extractor.fs, batch_size or extractor.batch_size):
+        freqs = []
+        for path in paths:
+            relative = os.path.relpath(path, folder)
+            freq = fundamentals.get(relative, fundamentals.get(os.path.basename(path)))
+            if freq is None:
+                freq = fundamental_from_name(path)
+            freqs.append(default_freq if freq is None else freq)
+        parts.append(extractor.extract(clips, freqs, save=False))
+    extractor.save_cache()
+    if not parts:
+        return {}
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare generated notes with natural guitar recordings")
+    parser.add_argument("generated", help="folder of generated notes")
+    parser.add_argument("reference", help="folder of natural guitar notes")
+    parser.add_argument("--fs", type=int, default=44100)
+    parser.add_argument("--freq", type=float, default=None,
+                        help="fundamental in Hz for clips without a per-file one; estimated when omitted")
+    parser.add_argument("--f0", default=None,
+                        help="JSON sidecar of {file name or path relative to its folder: Hz}; "
+                             "file names like E2_x.wav or 82.41Hz_x.wav are used otherwise")
+    parser.add_argument("--cache", default="feature_cache.json")
+    args = parser.parse_args()
+
+    extractor = FeatureExtractor(args.fs, cache_path=args.cache)
+    fundamentals = load_fundamentals(args.f0) if args.f0 else None
+
+    t0 = time.perf_counter()
+    generated = extract_folder(extractor, args.generated, fundamentals, args.freq)
+    reference = extract_folder(extractor, args.reference, fundamentals, args.freq)
+    print(f"Extracted features in {time.perf_counter() - t0:.1f}s")
+
+    rows, score = compare_features(generated, reference)
+    print(f"{'feature':24s} {'generated':>10s} {'natural':>10s} {'std':>10s} {'effect':>8s}")
+    for label, gen_mean, ref_mean, pooled_std, effect in rows:
+        print(f"{label:24s} {gen_mean:10.4g} {ref_mean:10.4g} {pooled_std:10.4g} {effect:8.2f}")
+    print(f"Overall score (mean |effect size|, lower is closer): {score:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from synthesis_pipeline import SynthesisPipeline, improved_pipeline
+
+
+def as_float_audio(clips):
+    """Clips as a floating array; integer PCM becomes float32 in [-1, 1)
+
+    The effects work in the batch dtype, so integer samples would wrap (or
+    fail on the float parameters) instead of being processed.
+    """
+    clips = np.asarray(clips)
+    if np.issubdtype(clips.dtype, np.floating):
+        return clips
+    if np.issubdtype(clips.dtype, np.integer):
+        return clips.astype(np.float32) / np.float32(2 ** (8 * clips.dtype.itemsize - 1))
+    raise TypeError(f"Expected float or integer PCM audio, got dtype {clips.dtype}")
+
+
+class BatchAugmenter:
+    """Randomized DI-style effects applied to whole (batch, samples) arrays
+
+    The models' DI stages bake one gain, saturation, hum and noise setting
+    into every render. Here each row of a batch gets its own random
+    setting instead, drawn as per-row parameter vectors, so a small set of
+    clean renders gives a new variant on every pass. Every effect is a
+    2-D array operation over the full batch; the only Python loop is over
+    the few hum harmonics.
+
+    Ranges are (low, high) tuples; set a probability to 0 or a range to
+    (0, 0) to switch that effect off. The output keeps the batch dtype;
+    integer PCM batches are converted with as_float_audio first.
+    """
+
+    def __init__(self, fs=44100, gain_db=(-6.0, 3.0), polarity_probability=0.5,
+                 max_shift=0.005, saturation_probability=0.5, drive=(1.0, 3.0),
+                 hum_freqs=(50, 60), hum_level=(0.0, 2e-4), hum_harmonics=(1.0, 0.5, 0.25),
+                 noise_level=(0.0, 1e-4), noise_cutoff=(2000.0, 12000.0), seed=None):
+        self.fs = fs
+        self.gain_db = gain_db
+        self.polarity_probability = polarity_probability
+        self.max_shift = int(max_shift * fs)
+        self.saturation_probability = saturation_probability
+        self.drive = drive
+        self.hum_freqs = np.asarray(hum_freqs, dtype=float)
+        self.hum_level = hum_level
+        self.hum_harmonics = hum_harmonics
+        self.noise_level = noise_level
+        self.noise_cutoff = noise_cutoff
+        self.rng = np.random.default_rng(seed)
+
+    def sample_params(self, batch_size):
+        """One random setting per row, as arrays of length batch_size"""
+        rng = self.rng
+        polarity = np.where(rng.random(batch_size) < self.polarity_probability, -1.0, 1.0)
+        return {
+            "gain": polarity * 10 ** (rng.uniform(*self.gain_db, batch_size) / 20),
+            "shift": rng.integers(-self.max_shift, self.max_shift + 1, batch_size),
+            "drive": np.where(rng.random(batch_size) < self.saturation_probability,
+                              rng.uniform(*self.drive, batch_size), 0.0),
+            "hum_freq": rng.choice(self.hum_freqs, batch_size),
+            "hum_phase": rng.uniform(0, 2 * np.pi, batch_size),
+            "hum_level": rng.uniform(*self.hum_level, batch_size),
+            "noise_level": rng.uniform(*self.noise_level, batch_size),
+            "noise_cutoff": rng.uniform(*self.noise_cutoff, batch_size),
+        }
+
+    def __call__(self, batch, params=None):
+        batch = np.atleast_2d(as_float_audio(batch))
+        rows, n = batch.shape
+        dtype = batch.dtype
+        params = params or self.sample_params(rows)
+
+        # Time shift with zero fill, as one gather over the whole batch
+        idx = np.arange(n)[None, :] - params["shift"][:, None]
+        valid = (idx >= 0) & (idx < n)
+        out = np.take_along_axis(batch, np.clip(idx, 0, n - 1), axis=1)
+        out *= valid
+
+        # Gain and polarity in one per-row multiply
+        out *= params["gain"].astype(dtype)[:, None]
+
+        # tanh saturation, level-matched so a full-scale peak stays full scale
+        drive = params["drive"]
+        saturated = drive > 0
+        if saturated.any():
+            d = drive[saturated].astype(dtype)[:, None]
+            out[saturated] = np.tanh(out[saturated] * d) / np.tanh(d)
+
+        out += self._hum(params, n, dtype)
+        out += self._noise(params, rows, n, dtype)
+        return out
+
+    def _hum(self, params, n, dtype):
+        """Mains hum with harmonics; the phase is random per row"""
+        t = np.arange(n, dtype=dtype) / dtype.type(self.fs)
+        phase = (2 * np.pi * params["hum_freq"]).astype(dtype)[:, None] * t
+        hum = np.zeros((len(phase), n), dtype=dtype)
+        for k, amplitude in enumerate(self.hum_harmonics, start=1):
+            hum += dtype.type(amplitude) * np.sin(k * (phase + params["hum_phase"].astype(dtype)[:, None]))
+        hum *= params["hum_level"].astype(dtype)[:, None]
+        return hum
+
+    def _noise(self, params, rows, n, dtype):
+        """High-passed noise shaped in the frequency domain
+
+        Every row has its own cutoff, which a shared lfilter call cannot do,
+        so white noise spectra are multiplied by per-row 2nd-order
+        Butterworth high-pass magnitude responses instead.
+        """
+        spectrum = np.fft.rfft(self.rng.standard_normal((rows, n)), axis=1)
+        freqs = np.fft.rfftfreq(n, 1 / self.fs)
+        ratio = params["noise_cutoff"][:, None] / np.maximum(freqs, 1e-3)[None, :]
+        spectrum /= np.sqrt(1 + ratio ** 4)
+        spectrum *= params["noise_level"][:, None]
+        return np.fft.irfft(spectrum, n, axis=1).astype(dtype)
+
+
+class AugmentedBatchStream:
+    """Endless augmented batches from a fixed set of clean clips
+
+    Batches are drawn (with replacement) from `clips`, a (clips, samples)
+    array, optionally cropped to `segment_length` samples at random
+    offsets, and augmented on a background thread so the next batches are
+    ready while the model trains on the current one. NumPy releases the GIL
+    in the heavy array work, so the producer overlaps with training. An
+    exception in the producer is re-raised in the consuming thread.
+    Integer PCM clips are converted once with as_float_audio.
+    """
+
+    def __init__(self, clips, augmenter, batch_size=32, segment_length=None, prefetch=4, seed=None):
+        self.clips = np.atleast_2d(as_float_audio(clips))
+        self.augmenter = augmenter
+        self.batch_size = batch_size
+        self.segment_length = segment_length or self.clips.shape[1]
+        if self.segment_length > self.clips.shape[1]:
+            raise ValueError(f"segment_length {self.segment_length} is longer than the clips "
+                             f"({self.clips.shape[1]} samples)")
+        self.prefetch = prefetch
+        self.rng = np.random.default_rng(seed)
+
+    def _next_batch(self):
+        rows = self.rng.integers(len(self.clips), size=self.batch_size)
+        starts = self.rng.integers(self.clips.shape[1] - self.segment_length + 1, size=self.batch_size)
+        idx = starts[:, None] + np.arange(self.segment_length)[None, :]
+        return self.augmenter(self.clips[rows[:, None], idx])
+
+    def __iter__(self):
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def produce():
+            while not stop.is_set():
+                try:
+                    item = self._next_batch()
+                except Exception as e:  # handed to the consumer, which would otherwise wait forever
+                    item = e
+                while not stop.is_set():
+                    try:
+                        batches.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                if isinstance(item, Exception):
+                    return
+
+        worker = threading.Thread(target=produce, daemon=True)
+        worker.start()
+        try:
+            while True:
+                batch = batches.get()
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            stop.set()
+            worker.join()
+
+
+def render_clean_clips(pipeline, notes, skip=("di",)):
+    """Render notes through a pipeline with its DI stage (or others) left out
+
+    notes are (fundamental_freq, duration, velocity, palm_mute) tuples of
+    equal duration; returns a (notes, samples) array for BatchAugmenter.
+    """
+    clean = SynthesisPipeline([s for s in pipeline.stages if s.name not in skip], pipeline.seed)
+    return np.stack([clean.render(*note) for note in notes])
+
+
+# Usage example: 12 clean renders streamed as augmented training batches
+def main():
+    notes = [(f, 1.0, v, pm) for f in (58.27, 82.41, 110.0) for v in (0.5, 0.9) for pm in (False, True)]
+
+    t0 = time.perf_counter()
+    clips = render_clean_clips(improved_pipeline(seed=1), notes)
+    render_time = time.perf_counter() - t0
+    print(f"Rendered {len(clips)} clean notes in {render_time:.1f} s "
+          f"({render_time / len(clips) * 1000:.0f} ms per note)")
+
+    stream = AugmentedBatchStream(clips, BatchAugmenter(seed=1), batch_size=64,
+                                  segment_length=22050, seed=1)
+    num_batches = 20
+    t0 = time.perf_counter()
+    for i, batch in zip(range(num_batches), stream):
+        pass
+    elapsed = time.perf_counter() - t0
+    print(f"Streamed {num_batches} batches of {batch.shape} in {elapsed:.2f} s "
+          f"({elapsed / (num_batches * len(batch)) * 1000:.2f} ms per augmented clip)")
+
+
+if __name__ == "__main__":
+    main()
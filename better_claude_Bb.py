@@ -1,41 +1,85 @@
 import numpy as np
 import soundfile as sf
-from scipy.signal import butter, lfilter, iirfilter
+from scipy.signal import butter, lfilter, iirfilter, sosfilt
+
+import postprocessing
+from precision import check_dtype, resolve_dtype
+from string_filter import karplus_strong, noise_bursts
 
 
 class ImprovedGuitarStringModel:
-    def __init__(self, fs=44100):
+    # Real acoustic guitar body resonances
+    body_freqs = [85, 150, 200, 250]  # Hz - typical guitar body resonances
+
+    # Unit body band-pass impulse responses keyed by sample rate
+    _body_band_cache = {}
+
+    def __init__(self, fs=44100, dtype=np.float64, excitation_bank=None):
         self.fs = fs
+        self.dtype = resolve_dtype(dtype)
+
+        # Optional ExcitationBank("improved") to look up attacks instead of generating them
+        if excitation_bank is not None and (excitation_bank.style, excitation_bank.fs) != ("improved", fs):
+            raise ValueError("excitation_bank must use the 'improved' style at the model's fs")
+        self.excitation_bank = excitation_bank
+
+    def pluck(self, fundamental_freq, duration=2.0, velocity=1.0, palm_mute=False, normalize=True):
+        """Improved Karplus-Strong synthesis based on real guitar analysis
+
+        normalize=False skips the final level normalization, for callers that
+        mix notes and normalize the mix once.
+        """
+        delay_line = self._excitation(fundamental_freq, velocity)
+        output = self._string_loop(delay_line, fundamental_freq, duration, velocity, palm_mute)
+
+        # IMPROVEMENT 7: Enhanced body resonance
+        output = check_dtype(self._add_enhanced_body_resonance(output, fundamental_freq), self.dtype, "body resonance")
+
+        # IMPROVEMENT 8: Enhanced harmonics with inharmonicity
+        output = check_dtype(self._add_realistic_harmonics(output, fundamental_freq), self.dtype, "harmonics")
+
+        # IMPROVEMENT 9: Realistic DI processing
+        output = check_dtype(self._enhanced_di_processing(output), self.dtype, "DI processing")
 
-    def pluck(self, fundamental_freq, duration=2.0, velocity=1.0, palm_mute=False):
-        """Improved Karplus-Strong synthesis based on real guitar analysis"""
+        # Normalize with headroom - INCREASED VOLUME
+        if not normalize:
+            return output
+        return check_dtype(self._normalize(output), self.dtype, "normalization")
 
+    def _excitation(self, fundamental_freq, velocity, pick_hardness=0.5):
+        """Delay line initialized with a sharp, high-passed pick impulse"""
         # IMPROVEMENT 1: More accurate delay line calculation
         delay_samples = int(np.round(self.fs / fundamental_freq))
+        excitation = np.zeros(delay_samples, dtype=self.dtype)
 
         # IMPROVEMENT 2: Sharp attack transient (like real guitar - 0.6ms to peak)
-        impulse_length = max(int(0.001 * self.fs), 10)  # 1ms sharp attack
-        excitation = np.zeros(delay_samples)
+        if self.excitation_bank is not None:
+            impulse = self.excitation_bank.draw(velocity, pick_hardness, self.dtype)
+        else:
+            impulse_length = max(int(0.001 * self.fs), 10)  # 1ms sharp attack
 
-        # Sharp initial impulse (mimics pick hitting string)
-        impulse = np.zeros(impulse_length)
-        impulse[0] = velocity * 5.0  # Sharp initial spike - INCREASED
+            # Sharp initial impulse (mimics pick hitting string)
+            impulse = np.zeros(impulse_length, dtype=self.dtype)
+            impulse[0] = velocity * 5.0  # Sharp initial spike - INCREASED
 
-        # Brief noisy transient following the impulse
-        for i in range(1, impulse_length):
-            impulse[i] = velocity * 0.8 * np.random.uniform(-1, 1) * np.exp(-i * 0.02)  # INCREASED
+            # Brief noisy transient following the impulse
+            for i in range(1, impulse_length):
+                impulse[i] = velocity * 0.8 * np.random.uniform(-1, 1) * np.exp(-i * 0.02)  # INCREASED
 
-        # High-frequency emphasis for pick attack realism
-        b_attack, a_attack = butter(2, 0.8, btype='high')
-        impulse = lfilter(b_attack, a_attack, impulse)
+            # High-frequency emphasis for pick attack realism
+            b_attack, a_attack = butter(2, 0.8, btype='high')
+            impulse = lfilter(b_attack.astype(self.dtype), a_attack.astype(self.dtype), impulse)
 
         # Initialize delay line
-        excitation[:len(impulse)] = impulse
+        excitation[:len(impulse)] = impulse[:delay_samples]  # high notes: delay line shorter than the attack
         delay_line = excitation.copy()
 
+        return delay_line
+
+    def _string_loop(self, delay_line, fundamental_freq, duration, velocity, palm_mute):
+        """Karplus-Strong loop over an initialized delay line (modified in place)"""
         # Calculate total samples
         total_samples = int(duration * self.fs)
-        output = np.zeros(total_samples)
 
         # IMPROVEMENT 3: Frequency-dependent damping (realistic decay)
         freq_factor = fundamental_freq / 100.0
@@ -49,94 +93,73 @@ class ImprovedGuitarStringModel:
         sustain_decay_rate = 0.9999 if palm_mute else 0.99995
         transition_samples = int(0.05 * self.fs)  # Switch to sustain mode after 50ms
 
-        # IMPROVEMENT 5: Body resonance filters (formants)
-        # Real acoustic guitar body resonances
-        body_freqs = [85, 150, 200, 250]  # Hz - typical guitar body resonances
-        body_filters = []
-        for freq in body_freqs:
-            if freq < self.fs / 2:
-                # Resonant peak filter
-                Q = 8.0
-                w = 2 * np.pi * freq / self.fs
-                b_res, a_res = iirfilter(2, [freq * 0.9, freq * 1.1],
-                                         btype='band', ftype='butter', fs=self.fs)
-                body_filters.append((b_res, a_res))
-
-        delay_pos = 0
-        last_filtered = 0
-        body_states = [np.zeros(len(a_res) - 1) for _ in body_filters]  # Filter memory
-
-        for i in range(total_samples):
-            # Get current sample
-            current_sample = delay_line[delay_pos]
-
-            # Add subtle string noise (much less than original)
-            if np.random.rand() < 0.0001:  # Very rare
-                current_sample += np.random.uniform(-0.05, 0.05) * velocity
-
-            output[i] = current_sample
-
-            # Next sample for KS averaging
-            next_pos = (delay_pos + 1) % delay_samples
-            next_sample = delay_line[next_pos]
-
-            # Karplus-Strong filtering with improvements
-            averaged = 0.5 * (current_sample + next_sample)
-
-            # Frequency-dependent low-pass filtering
-            lp_coeff = 0.6 if fundamental_freq > 200 else 0.8  # Higher notes need more filtering
-            filtered = lp_coeff * averaged + (1 - lp_coeff) * last_filtered
-
-            # IMPROVEMENT 6: Multi-stage decay based on time
-            if i < transition_samples:
-                # Fast initial decay phase
-                current_damping = initial_decay_rate
-            else:
-                # Sustain phase with slower decay
-                current_damping = sustain_decay_rate
-
-            # Apply frequency-dependent damping variation
-            if fundamental_freq > 150:
-                current_damping *= high_freq_damping
-            else:
-                current_damping *= low_freq_damping
-
-            damped = current_damping * filtered
-
-            delay_line[delay_pos] = damped
-            last_filtered = filtered
-            delay_pos = (delay_pos + 1) % delay_samples
+        # Apply frequency-dependent damping variation to both stages
+        freq_damping = high_freq_damping if fundamental_freq > 150 else low_freq_damping
+        damping = [(0, initial_decay_rate * freq_damping), (transition_samples, sustain_decay_rate * freq_damping)]
 
-        # IMPROVEMENT 7: Enhanced body resonance
-        output = self._add_enhanced_body_resonance(output, fundamental_freq, body_filters, body_states)
+        # Frequency-dependent low-pass filtering
+        lp_coeff = 0.6 if fundamental_freq > 200 else 0.8  # Higher notes need more filtering
 
-        # IMPROVEMENT 8: Enhanced harmonics with inharmonicity
-        output = self._add_realistic_harmonics(output, fundamental_freq)
+        # Add subtle string noise (much less than original); it feeds back into the string
+        indices, values = noise_bursts(total_samples, 0.0001, -0.05, 0.05)  # Very rare
+        noise = (indices, values * velocity)
 
-        # IMPROVEMENT 9: Realistic DI processing
-        output = self._enhanced_di_processing(output)
+        return karplus_strong(delay_line, total_samples, damping, lp_coeff, loop_noise=noise)
 
-        # Normalize with headroom - INCREASED VOLUME
-        if np.max(np.abs(output)) > 0:
-            output = output / np.max(np.abs(output)) * 0.95  # Higher normalization level
+    def _body_band_responses(self):
+        """Unit impulse responses of the body band-pass filters, one row per body_freq
 
-        return output
+        Built once per sample rate in float64 and trimmed where every band is
+        below -180 dB of its own peak. Only the mixing weights depend on the
+        note, so these are shared by all pitches.
+        """
+        if self.fs in self._body_band_cache:
+            return self._body_band_cache[self.fs]
 
-    def _add_enhanced_body_resonance(self, signal, fundamental_freq, body_filters, body_states):
+        # IMPROVEMENT 5: Body resonance filters (formants)
+        impulse = np.zeros(self.fs)
+        impulse[0] = 1.0
+        bands = []
+        for body_freq in self.body_freqs:
+            if body_freq < self.fs / 2:
+                # Resonant peak filter, as SOS for accuracy at low frequencies
+                sos_res = iirfilter(2, [body_freq * 0.9, body_freq * 1.1],
+                                    btype='band', ftype='butter', fs=self.fs, output='sos')
+                bands.append((body_freq, sosfilt(sos_res, impulse)))
+
+        freqs = np.array([f for f, _ in bands], dtype=float)
+        responses = np.array([r for _, r in bands]).reshape(len(bands), self.fs)
+        peaks = np.abs(responses).max(axis=1, keepdims=True)
+        audible = np.nonzero((np.abs(responses) > 1e-9 * peaks).any(axis=0))[0]
+        responses = np.ascontiguousarray(responses[:, :audible[-1] + 1] if len(audible) else responses[:, :1])
+
+        self._body_band_cache[self.fs] = (freqs, responses)
+        return freqs, responses
+
+    def _body_impulse_response(self, fundamental_freq):
+        """Dry path plus every body resonance as one impulse response
+
+        A weighted sum of the cached band responses, with each band scaled by
+        its proximity to the fundamental, trimmed once it falls below -120 dB.
+        """
+        freqs, responses = self._body_band_responses()
+        # Scale based on proximity to fundamental
+        weights = 0.15 * np.exp(-np.abs(fundamental_freq - freqs) / 50.0)  # INCREASED
+        body_ir = weights @ responses
+
+        audible = np.nonzero(np.abs(body_ir) > 1e-6 * np.max(np.abs(body_ir)))[0]
+        body_ir = body_ir[:audible[-1] + 1] if len(audible) else body_ir[:1]
+        body_ir[0] += 1.0  # dry signal
+
+        return body_ir.astype(self.dtype)
+
+    def _add_enhanced_body_resonance(self, signal, fundamental_freq):
         """Add realistic guitar body resonances using multiple formant filters"""
-        t = np.arange(len(signal)) / self.fs
-
-        # Apply body resonance filters
-        resonant_signal = signal.copy()
-        for i, (b_res, a_res) in enumerate(body_filters):
-            # Filter the signal through each body resonance
-            filtered_component = lfilter(b_res, a_res, signal)
-            # Scale based on proximity to fundamental
-            body_freq = [85, 150, 200, 250][i]
-            proximity = np.exp(-abs(fundamental_freq - body_freq) / 50.0)
-            resonant_signal += filtered_component * 0.15 * proximity  # INCREASED
+        # Apply all body resonance filters in a single FFT convolution (in place)
+        resonant_signal = postprocessing.convolve_in_place(signal, self._body_impulse_response(fundamental_freq))
 
         # IMPROVEMENT: Add realistic harmonics with proper amplitudes
+        partials = []
         for n in [2, 3, 4, 5]:
             if fundamental_freq * n < self.fs / 2:
                 # More realistic harmonic amplitude scaling
@@ -145,58 +168,46 @@ class ImprovedGuitarStringModel:
                 stretch_factor = 1 + (n - 1) * 0.0002  # Stretch tuning effect
                 harmonic_freq = fundamental_freq * n * stretch_factor
 
-                # Harmonic with natural envelope
-                harmonic = harm_amp * np.sin(2 * np.pi * harmonic_freq * t)
                 # Harmonics decay faster than fundamental
                 decay_rate = 0.8 + 0.1 * n
-                harmonic *= np.exp(-t * decay_rate)
-                resonant_signal += harmonic
+                partials.append((2 * np.pi * harmonic_freq, harm_amp, decay_rate))
 
-        return resonant_signal
+        return postprocessing.add_partials(resonant_signal, self.fs, partials)
 
     def _add_realistic_harmonics(self, signal, fundamental_freq):
-        """Add enhanced harmonic content with realistic characteristics"""
-        t = np.arange(len(signal)) / self.fs
-
-        # Enhance existing harmonics and add missing ones
-        enhanced = signal.copy()
-
+        """Add enhanced harmonic content with realistic characteristics (in place)"""
         # Add formant-like resonances typical of guitar
         formant_freqs = [100, 160, 250, 350]  # Typical guitar formants
+        partials = []
         for f_freq in formant_freqs:
             if f_freq < self.fs / 2:
-                formant_amp = 0.05 * np.exp(-abs(fundamental_freq - f_freq) / 80.0)  # INCREASED
-                formant = formant_amp * np.sin(2 * np.pi * f_freq * t)
-                formant *= np.exp(-t * 1.2)  # Formants decay
-                enhanced += formant
+                formant_amp = 0.05 * float(np.exp(-abs(fundamental_freq - f_freq) / 80.0))  # INCREASED
+                partials.append((2 * np.pi * f_freq, formant_amp, 1.2))  # Formants decay
 
-        return enhanced
+        return postprocessing.add_partials(signal, self.fs, partials)
 
-    def _enhanced_di_processing(self, signal):
-        """More realistic DI box simulation"""
+    def _enhanced_di_processing(self, signal, drive=1.002, hum_freq=60, noise_level=0.00005):
+        """More realistic DI box simulation (in place)"""
         # High-pass filter (typical DI input impedance effect)
         b_hp, a_hp = butter(1, 30, 'hp', fs=self.fs)
-        signal = lfilter(b_hp, a_hp, signal)
+        postprocessing.filter_in_place(signal, b_hp.astype(self.dtype), a_hp.astype(self.dtype))
 
         # Subtle saturation modeling (tube DI or preamp)
-        drive = 1.002  # REDUCED to prevent volume loss
-        signal = np.tanh(signal * drive) * 0.98  # INCREASED output level
+        # drive REDUCED to 1.002 by default to prevent volume loss
+        postprocessing.saturate(signal, drive, 0.98)  # INCREASED output level
 
         # Add very subtle electrical noise (60Hz hum + high freq noise)
-        hum_freq = 60  # Hz
-        t = np.arange(len(signal)) / self.fs
-        hum = 0.00008 * np.sin(2 * np.pi * hum_freq * t)
+        postprocessing.add_partials(signal, self.fs, [(2 * np.pi * hum_freq, 0.00008, None)])
 
         # High frequency noise (cable/electronics)
-        noise_level = 0.00005
-        hf_noise = noise_level * np.random.normal(0, 1, len(signal))
         b_hf, a_hf = butter(2, 0.8, 'high')
-        hf_noise = lfilter(b_hf, a_hf, hf_noise)
-
-        signal += hum + hf_noise
+        postprocessing.add_filtered_noise(signal, b_hf.astype(self.dtype), a_hf.astype(self.dtype), noise_level)
 
         return signal
 
+    def _normalize(self, signal, peak=0.95):
+        return postprocessing.normalize(signal, peak)  # Higher normalization level
+
 
 # Usage example with improvements
 def main():
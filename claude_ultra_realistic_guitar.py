@@ -2,143 +2,155 @@ import numpy as np
 import soundfile as sf
 from scipy.signal import butter, lfilter, iirfilter
 
+import postprocessing
+from precision import check_dtype, resolve_dtype
+from string_filter import karplus_strong, noise_bursts
+
 
 class RealisticGuitarStringModel:
-    def __init__(self, fs=44100):
+    # Peak of a normalized note, before the asymmetric boost and clip
+    natural_scale = 1.45
+
+    def __init__(self, fs=44100, dtype=np.float64, excitation_bank=None):
         self.fs = fs
+        self.dtype = resolve_dtype(dtype)
 
-    def pluck(self, fundamental_freq, duration=2.0, velocity=1.0, palm_mute=False):
-        """Ultra-realistic Karplus-Strong synthesis based on detailed natural guitar analysis"""
+        # Optional ExcitationBank("realistic") to look up attacks instead of generating them
+        if excitation_bank is not None and (excitation_bank.style, excitation_bank.fs) != ("realistic", fs):
+            raise ValueError("excitation_bank must use the 'realistic' style at the model's fs")
+        self.excitation_bank = excitation_bank
 
-        # More accurate delay line calculation
-        delay_samples = int(np.round(self.fs / fundamental_freq))
+    def pluck(self, fundamental_freq, duration=2.0, velocity=1.0, palm_mute=False, normalize=True):
+        """Ultra-realistic Karplus-Strong synthesis based on detailed natural guitar analysis
 
-        # CRITICAL FIX 1: Realistic chaotic attack with delayed peak
-        impulse_length = max(int(0.003 * self.fs), 15)  # 3ms attack like natural
-        excitation = np.zeros(delay_samples)
+        normalize=False keeps the natural-style asymmetry and clipping but
+        returns the note at its raw level, for callers that mix notes and
+        normalize the mix once.
+        """
+        delay_line = self._excitation(fundamental_freq, velocity)
+        output = self._string_loop(delay_line, fundamental_freq, duration, velocity, palm_mute)
 
-        # Create realistic chaotic initial impulse (matches natural guitar pattern)
-        impulse = np.zeros(impulse_length)
+        # CRITICAL FIX 5: Enhanced harmonics matching natural spectrum
+        output = check_dtype(self._add_realistic_harmonics_v2(output, fundamental_freq), self.dtype, "harmonics")
 
-        # Natural guitar has small initial values, then builds to peak around sample 13 (0.6ms)
-        peak_position = int(0.0006 * self.fs)  # 0.6ms like natural guitar
+        # CRITICAL FIX 6: Match natural frequency content distribution
+        output = check_dtype(self._add_spectral_richness(output, fundamental_freq), self.dtype, "spectral richness")
 
-        # Create chaotic pre-peak transient (like pick scraping/noise)
-        for i in range(peak_position):
-            # Chaotic build-up with both positive and negative spikes
-            chaos_factor = np.random.uniform(-1, 1) * velocity * 0.3
-            impulse[i] = chaos_factor * (i / peak_position) * np.random.choice([-1, 1])
+        # CRITICAL FIX 7: Realistic amplitude scaling (match natural dynamic range)
+        raw_peak = postprocessing.peak(output)
+        output = check_dtype(self._normalize_like_natural(output), self.dtype, "normalization")
+        if not normalize and raw_peak > 0:
+            # The shaping is relative to the peak; only undo the level change
+            output *= output.dtype.type(raw_peak / self.natural_scale)
 
-        # Sharp peak at correct timing (matches natural 0.715 amplitude)
-        impulse[peak_position] = velocity * 3.2  # Much higher amplitude like natural
+        return output
 
-        # Post-peak chaos (string settling)
-        for i in range(peak_position + 1, impulse_length):
-            decay_factor = np.exp(-(i - peak_position) * 0.1)
-            chaos = np.random.uniform(-1, 1) * velocity * 0.8 * decay_factor
-            impulse[i] = chaos
+    def _excitation(self, fundamental_freq, velocity, pick_hardness=0.5):
+        """Delay line initialized with a chaotic pick attack peaking at 0.6ms"""
+        # More accurate delay line calculation
+        delay_samples = int(np.round(self.fs / fundamental_freq))
+        excitation = np.zeros(delay_samples, dtype=self.dtype)
 
-        # CRITICAL FIX 2: Add realistic high-frequency pick noise
-        pick_noise = np.random.normal(0, velocity * 0.4, impulse_length)
-        # High-pass filter for realistic pick scrape
-        b_pick, a_pick = butter(3, 0.7, btype='high')
-        pick_noise = lfilter(b_pick, a_pick, pick_noise)
-        impulse += pick_noise
+        # CRITICAL FIX 1: Realistic chaotic attack with delayed peak
+        if self.excitation_bank is not None:
+            impulse = self.excitation_bank.draw(velocity, pick_hardness, self.dtype)
+        else:
+            impulse_length = max(int(0.003 * self.fs), 15)  # 3ms attack like natural
+
+            # Create realistic chaotic initial impulse (matches natural guitar pattern)
+            impulse = np.zeros(impulse_length, dtype=self.dtype)
+
+            # Natural guitar has small initial values, then builds to peak around sample 13 (0.6ms)
+            peak_position = int(0.0006 * self.fs)  # 0.6ms like natural guitar
+
+            # Create chaotic pre-peak transient (like pick scraping/noise)
+            for i in range(peak_position):
+                # Chaotic build-up with both positive and negative spikes
+                chaos_factor = np.random.uniform(-1, 1) * velocity * 0.3
+                impulse[i] = chaos_factor * (i / peak_position) * np.random.choice([-1, 1])
+
+            # Sharp peak at correct timing (matches natural 0.715 amplitude)
+            impulse[peak_position] = velocity * 3.2  # Much higher amplitude like natural
+
+            # Post-peak chaos (string settling)
+            for i in range(peak_position + 1, impulse_length):
+                decay_factor = np.exp(-(i - peak_position) * 0.1)
+                chaos = np.random.uniform(-1, 1) * velocity * 0.8 * decay_factor
+                impulse[i] = chaos
+
+            # CRITICAL FIX 2: Add realistic high-frequency pick noise
+            pick_noise = np.random.normal(0, velocity * 0.4, impulse_length).astype(self.dtype)
+            # High-pass filter for realistic pick scrape
+            b_pick, a_pick = butter(3, 0.7, btype='high')
+            pick_noise = lfilter(b_pick.astype(self.dtype), a_pick.astype(self.dtype), pick_noise)
+            impulse += pick_noise
 
         # Initialize delay line with chaotic impulse
-        excitation[:len(impulse)] = impulse
+        excitation[:len(impulse)] = impulse[:delay_samples]  # high notes: delay line shorter than the attack
         delay_line = excitation.copy()
 
+        return delay_line
+
+    def _string_loop(self, delay_line, fundamental_freq, duration, velocity, palm_mute,
+                     base_damping=None, initial_decay_rate=None, sustain_decay_rate=None,
+                     transition_time=0.02, lp_coeff=None, noise_probability=0.0005):
+        """Karplus-Strong loop over an initialized delay line (modified in place)
+
+        Loop constants left as None use the hand-tuned, palm-mute and
+        pitch dependent values below.
+        """
         # Calculate total samples
         total_samples = int(duration * self.fs)
-        output = np.zeros(total_samples)
 
         # CRITICAL FIX 3: Proper decay characteristics (match natural 0.9746)
-        base_damping = 0.9975 if palm_mute else 0.9995
+        if base_damping is None:
+            base_damping = 0.9975 if palm_mute else 0.9995
         # Frequency-dependent damping like real strings
         freq_factor = fundamental_freq / 100.0
         high_freq_damping = base_damping - freq_factor * 0.00008
 
         # Multi-stage decay to match natural envelope
-        initial_decay_rate = 0.994 if palm_mute else 0.9985  # Fast initial decay
-        sustain_decay_rate = 0.9996 if palm_mute else 0.99985  # Slower sustain
-        transition_samples = int(0.02 * self.fs)  # 20ms transition
-
-        delay_pos = 0
-        last_filtered = 0
-
-        # Add realistic string noise and imperfections
-        noise_probability = 0.0005  # Higher probability for realism
-
-        for i in range(total_samples):
-            # Get current sample
-            current_sample = delay_line[delay_pos]
-
-            # Add realistic string noise (scratches, fret buzz, etc.)
-            if np.random.rand() < noise_probability:
-                # Realistic noise amplitude based on analysis
-                noise_amp = np.random.uniform(-0.08, 0.08) * velocity
-                current_sample += noise_amp
-
-            output[i] = current_sample
-
-            # Next sample for KS averaging
-            next_pos = (delay_pos + 1) % delay_samples
-            next_sample = delay_line[next_pos]
-
-            # Karplus-Strong filtering with realistic characteristics
-            averaged = 0.5 * (current_sample + next_sample)
-
-            # CRITICAL FIX 4: Frequency-dependent filtering matching natural response
+        if initial_decay_rate is None:
+            initial_decay_rate = 0.994 if palm_mute else 0.9985  # Fast initial decay
+        if sustain_decay_rate is None:
+            sustain_decay_rate = 0.9996 if palm_mute else 0.99985  # Slower sustain
+        transition_samples = int(transition_time * self.fs)  # 20ms transition by default
+
+        # CRITICAL FIX 4: Frequency-dependent filtering matching natural response
+        if lp_coeff is None:
             if fundamental_freq > 200:
                 lp_coeff = 0.3  # More aggressive filtering for high notes
             else:
                 lp_coeff = 0.7  # Preserve lows
 
-            filtered = lp_coeff * averaged + (1 - lp_coeff) * last_filtered
-
-            # Multi-stage decay based on time (matches natural behavior)
-            if i < transition_samples:
-                current_damping = initial_decay_rate
-            else:
-                current_damping = sustain_decay_rate
-
-            # Apply frequency-dependent damping
-            if fundamental_freq > 150:
-                current_damping *= high_freq_damping
-
-            damped = current_damping * filtered
-            delay_line[delay_pos] = damped
-            last_filtered = filtered
-            delay_pos = (delay_pos + 1) % delay_samples
+        # Multi-stage decay based on time (matches natural behavior), with
+        # frequency-dependent damping for higher notes
+        freq_damping = high_freq_damping if fundamental_freq > 150 else 1
+        damping = [(0, initial_decay_rate * freq_damping), (transition_samples, sustain_decay_rate * freq_damping)]
 
-        # CRITICAL FIX 5: Enhanced harmonics matching natural spectrum
-        output = self._add_realistic_harmonics_v2(output, fundamental_freq)
+        # Add realistic string noise and imperfections (scratches, fret buzz, etc.);
+        # noise_probability defaults to 0.0005, higher for realism
+        indices, values = noise_bursts(total_samples, noise_probability, -0.08, 0.08)
+        noise = (indices, values * velocity)  # Realistic noise amplitude based on analysis
 
-        # CRITICAL FIX 6: Match natural frequency content distribution
-        output = self._add_spectral_richness(output, fundamental_freq)
-
-        # CRITICAL FIX 7: Realistic amplitude scaling (match natural dynamic range)
-        output = self._normalize_like_natural(output)
-
-        return output
+        return karplus_strong(delay_line, total_samples, damping, lp_coeff, loop_noise=noise)
 
-    def _add_realistic_harmonics_v2(self, signal, fundamental_freq):
-        """Add harmonics that match natural guitar spectral analysis"""
-        t = np.arange(len(signal)) / self.fs
-        enhanced = signal.copy()
+    def _add_realistic_harmonics_v2(self, signal, fundamental_freq, harmonic_frequencies=None):
+        """Add harmonics that match natural guitar spectral analysis (in place)"""
 
         # Based on natural guitar analysis: strong harmonics at 2x, 4x, 6x, etc.
-        harmonic_frequencies = [
-            (2, 0.08),  # 2nd harmonic - strong in natural
-            (3, 0.04),  # 3rd harmonic
-            (4, 0.06),  # 4th harmonic - prominent in natural
-            (5, 0.03),  # 5th harmonic
-            (6, 0.02),  # 6th harmonic
-            (8, 0.015),  # 8th harmonic
-            (12, 0.01),  # 12th harmonic
-        ]
-
+        if harmonic_frequencies is None:
+            harmonic_frequencies = [
+                (2, 0.08),  # 2nd harmonic - strong in natural
+                (3, 0.04),  # 3rd harmonic
+                (4, 0.06),  # 4th harmonic - prominent in natural
+                (5, 0.03),  # 5th harmonic
+                (6, 0.02),  # 6th harmonic
+                (8, 0.015),  # 8th harmonic
+                (12, 0.01),  # 12th harmonic
+            ]
+
+        partials = []
         for harmonic_num, amplitude in harmonic_frequencies:
             harmonic_freq = fundamental_freq * harmonic_num
             if harmonic_freq < self.fs / 2:
@@ -146,36 +158,30 @@ class RealisticGuitarStringModel:
                 stretch_factor = 1 + (harmonic_num - 1) * 0.0003
                 actual_freq = harmonic_freq * stretch_factor
 
-                # Harmonic signal with natural decay
-                harmonic_signal = amplitude * np.sin(2 * np.pi * actual_freq * t)
-
                 # Harmonics decay faster than fundamental (realistic behavior)
                 decay_rate = 1.2 + 0.15 * harmonic_num
-                harmonic_signal *= np.exp(-t * decay_rate)
-
-                enhanced += harmonic_signal
+                partials.append((2 * np.pi * actual_freq, amplitude, decay_rate))
 
-        return enhanced
-
-    def _add_spectral_richness(self, signal, fundamental_freq):
-        """Add the missing frequency components found in natural guitar"""
-        t = np.arange(len(signal)) / self.fs
-        enriched = signal.copy()
+        return postprocessing.add_partials(signal, self.fs, partials)
 
+    def _add_spectral_richness(self, signal, fundamental_freq, formant_frequencies=None):
+        """Add the missing frequency components found in natural guitar (in place)"""
         # From analysis: natural guitar has energy at these frequencies
-        formant_frequencies = [
-            (689, 0.02),  # Strong peak in natural
-            (861, 0.015),  # Secondary peak
-            (1034, 0.012),  # Tertiary peak
-            (1378, 0.008),  # Higher formant
-            (2068, 0.006),  # Upper formants
-            (2584, 0.008),
-            (2928, 0.010),
-            (3617, 0.012),  # Strong upper harmonic
-            (4134, 0.015),
-            (4306, 0.018),  # Very strong in natural
-        ]
-
+        if formant_frequencies is None:
+            formant_frequencies = [
+                (689, 0.02),  # Strong peak in natural
+                (861, 0.015),  # Secondary peak
+                (1034, 0.012),  # Tertiary peak
+                (1378, 0.008),  # Higher formant
+                (2068, 0.006),  # Upper formants
+                (2584, 0.008),
+                (2928, 0.010),
+                (3617, 0.012),  # Strong upper harmonic
+                (4134, 0.015),
+                (4306, 0.018),  # Very strong in natural
+            ]
+
+        partials = []
         for freq, amplitude in formant_frequencies:
             if freq < self.fs / 2:
                 # Proximity weighting - stronger if close to fundamental or harmonics
@@ -186,33 +192,23 @@ class RealisticGuitarStringModel:
                         proximity_weight = 2.0
                         break
 
-                formant_signal = amplitude * proximity_weight * np.sin(2 * np.pi * freq * t)
-
                 # Formants decay at different rates
                 decay_rate = 1.5 + freq / 2000.0
-                formant_signal *= np.exp(-t * decay_rate)
-
-                enriched += formant_signal
-
-        return enriched
-
-    def _normalize_like_natural(self, signal):
-        """Normalize to match natural guitar's dynamic range and characteristics"""
-        if np.max(np.abs(signal)) > 0:
-            # Natural guitar analysis showed range from -0.515 to 0.715
-            # That's about 1.23 total range, much wider than typical 0.95 normalization
-
-            # Scale to match natural amplitude distribution
-            signal = signal / np.max(np.abs(signal)) * 1.45  # Match natural range
+                partials.append((2 * np.pi * freq, amplitude * proximity_weight, decay_rate))
 
-            # Add subtle asymmetry like natural guitar (slightly more positive peaks)
-            asymmetry_factor = 1.02
-            signal = np.where(signal > 0, signal * asymmetry_factor, signal)
+        return postprocessing.add_partials(signal, self.fs, partials)
 
-            # Final clip to prevent overload but maintain character
-            signal = np.clip(signal, -0.95, 0.95)
+    def _normalize_like_natural(self, signal, scale=natural_scale, asymmetry_factor=1.02, clip_level=0.95):
+        """Normalize to match natural guitar's dynamic range and characteristics (in place)
 
-        return signal
+        Natural guitar analysis showed range from -0.515 to 0.715. That's about
+        1.23 total range, much wider than typical 0.95 normalization, so the
+        peak is scaled to `scale` (default natural_scale), positive
+        half-waves get a subtle boost like natural guitar, and a final clip
+        prevents overload while keeping the character. One peak scan, then
+        all three steps per block.
+        """
+        return postprocessing.normalize_asymmetric(signal, scale, asymmetry_factor, clip_level)
 
 
 # Usage example matching the original
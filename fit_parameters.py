@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+
+from synthesis_pipeline import realistic_pipeline
+
+
+# name: (pipeline stage, low, high)
+SEARCH_SPACE = {
+    "base_damping": ("string", 0.995, 0.99995),
+    "initial_decay_rate": ("string", 0.99, 0.9999),
+    "sustain_decay_rate": ("string", 0.999, 0.99999),
+    "transition_time": ("string", 0.005, 0.1),
+    "lp_coeff": ("string", 0.2, 0.9),
+    "harmonic_2": ("harmonics", 0.0, 0.15),
+    "harmonic_3": ("harmonics", 0.0, 0.1),
+    "harmonic_4": ("harmonics", 0.0, 0.1),
+    "harmonic_5": ("harmonics", 0.0, 0.06),
+    "harmonic_6": ("harmonics", 0.0, 0.05),
+    "harmonic_8": ("harmonics", 0.0, 0.04),
+    "harmonic_12": ("harmonics", 0.0, 0.03),
+}
+
+
+def search_space_for(fundamental_freq, space=None):
+    """The search space minus parameters that cannot affect this note
+
+    RealisticGuitarStringModel only uses base_damping through its
+    pitch-dependent damping above 150 Hz, so lower notes would spend a
+    search dimension on noise.
+    """
+    space = dict(space or SEARCH_SPACE)
+    if fundamental_freq <= 150:
+        space.pop("base_damping", None)
+    return space
+
+
+def candidate_overrides(candidate):
+    """Turn a flat {name: value} candidate into pipeline stage overrides"""
+    overrides = {}
+    harmonics = []
+    for name, value in candidate.items():
+        stage = SEARCH_SPACE[name][0]
+        if stage == "harmonics":
+            harmonics.append((int(name.split("_")[1]), value))
+        else:
+            overrides.setdefault(stage, {})[name] = value
+    if harmonics:
+        overrides["harmonics"] = {"harmonic_frequencies": sorted(harmonics)}
+    return overrides
+
+
+# === Vectorized spectral and envelope loss ===
+
+def spectral_envelope_features(signals, frame_size=2048, hop=512):
+    """Long-term log spectrum and frame RMS envelope for a (clips, samples) stack
+
+    Both are in dB relative to their own maximum so the loss ignores level.
+    """
+    signals = np.atleast_2d(signals)
+    frames = np.lib.stride_tricks.sliding_window_view(signals, frame_size, axis=1)[:, ::hop]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(frame_size), axis=-1)).mean(axis=1)
+    envelope = np.sqrt(np.mean(frames ** 2, axis=-1))
+
+    eps = 1e-10
+    spectrum_db = 20 * np.log10(spectrum + eps)
+    envelope_db = 20 * np.log10(envelope + eps)
+    spectrum_db -= spectrum_db.max(axis=1, keepdims=True)
+    envelope_db -= envelope_db.max(axis=1, keepdims=True)
+    return spectrum_db, envelope_db
+
+
+def feature_loss(features, reference, envelope_weight=1.0, floor_db=-80.0):
+    """Mean absolute dB error per clip; errors below floor_db are ignored"""
+    spectrum_db, envelope_db = (np.maximum(f, floor_db) for f in features)
+    ref_spectrum, ref_envelope = (np.maximum(f, floor_db) for f in reference)
+    spectral = np.mean(np.abs(spectrum_db - ref_spectrum), axis=1)
+    envelope = np.mean(np.abs(envelope_db - ref_envelope), axis=1)
+    return spectral + envelope_weight * envelope
+
+
+# === Process pool workers ===
+
+_worker = {}
+
+
+def _init_worker(fs, seed, note, references):
+    _worker["pipeline"] = realistic_pipeline(fs, seed=seed)
+    _worker["note"] = note
+    _worker["references"] = references
+
+
+def _evaluate_batch(args):
+    """Render a batch of candidates and score them in one vectorized pass"""
+    batch, duration = args
+    pipeline = _worker["pipeline"]
+    fundamental_freq, velocity, palm_mute = _worker["note"]
+
+    signals = np.stack([
+        pipeline.render(fundamental_freq, duration, velocity, palm_mute, **candidate_overrides(c))
+        for c in batch
+    ])
+    return feature_loss(spectral_envelope_features(signals), _worker["references"][duration]).tolist()
+
+
+class ParameterFitter:
+    """Successive-halving random search of RealisticGuitarStringModel parameters
+
+    Every candidate is first scored on a short excerpt; only the best
+    `keep` fraction is re-rendered at each longer rung, so bad candidates
+    stop early. Scores are cached on disk, keyed by the candidate, the note,
+    the seed, the sample rate and the reference file and segment, so re-runs
+    and widened searches reuse them.
+    """
+
+    def __init__(self, reference_path, fundamental_freq, fs=44100, velocity=0.7, palm_mute=False,
+                 start=0.0, duration=1.0, rungs=(0.25, 0.5, 1.0), keep=1 / 3,
+                 workers=None, batch_size=8, seed=0, cache_path=None):
+        self.reference_path = reference_path
+        self.note = (fundamental_freq, velocity, palm_mute)
+        self.fs = fs
+        self.start = start
+        self.durations = [round(duration * r, 4) for r in rungs]
+        self.keep = keep
+        self.workers = workers or os.cpu_count()
+        self.batch_size = batch_size
+        self.seed = seed
+        self.cache_path = cache_path
+
+        reference = self._load_reference(reference_path, start, duration)
+        self.references = {
+            d: tuple(f[0] for f in spectral_envelope_features(reference[:int(d * fs)]))
+            for d in self.durations
+        }
+
+        self.cache = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path) as f:
+                self.cache = json.load(f)
+
+    def _load_reference(self, path, start, duration):
+        audio, file_fs = sf.read(path, always_2d=True)
+        audio = audio.mean(axis=1)
+        if file_fs != self.fs:
+            audio = resample_poly(audio, self.fs, file_fs)
+        segment = audio[int(start * self.fs):int((start + duration) * self.fs)]
+        if len(segment) < int(duration * self.fs):
+            raise ValueError(f"{path} is shorter than start + duration ({start + duration}s)")
+        return segment
+
+    def _cache_key(self, candidate, duration):
+        return json.dumps({
+            "candidate": candidate, "duration": duration, "note": self.note, "seed": self.seed,
+            "fs": self.fs, "start": self.start,
+            "reference": [os.path.abspath(self.reference_path), os.path.getmtime(self.reference_path)],
+        }, sort_keys=True)
+
+    def sample_candidates(self, n, space=None, rng=None):
+        space = search_space_for(self.note[0], space)
+        rng = rng or np.random.default_rng(self.seed)
+        return [
+            {name: float(rng.uniform(low, high)) for name, (_, low, high) in space.items()}
+            for _ in range(n)
+        ]
+
+    def _score(self, pool, candidates, duration):
+        keys = [self._cache_key(c, duration) for c in candidates]
+        todo = [c for c, k in zip(candidates, keys) if k not in self.cache]
+
+        batches = [(todo[i:i + self.batch_size], duration) for i in range(0, len(todo), self.batch_size)]
+        losses = [loss for batch in pool.map(_evaluate_batch, batches) for loss in batch]
+        for candidate, loss in zip(todo, losses):
+            self.cache[self._cache_key(candidate, duration)] = loss
+
+        return np.array([self.cache[k] for k in keys])
+
+    def fit(self, candidates):
+        """Run successive halving; returns (best candidate, loss, history)"""
+        history = []
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                 initargs=(self.fs, self.seed, self.note, self.references)) as pool:
+            for rung, duration in enumerate(self.durations):
+                t0 = time.perf_counter()
+                losses = self._score(pool, candidates, duration)
+                order = np.argsort(losses)
+                history.append({
+                    "duration": duration, "candidates": len(candidates),
+                    "best_loss": float(losses[order[0]]), "seconds": time.perf_counter() - t0,
+                })
+                print(f"Rung {rung}: {len(candidates)} candidates at {duration}s, "
+                      f"best loss {losses[order[0]]:.2f} ({history[-1]['seconds']:.1f}s)")
+
+                if rung < len(self.durations) - 1:
+                    survivors = max(1, int(np.ceil(len(candidates) * self.keep)))
+                    candidates = [candidates[i] for i in order[:survivors]]
+                self._save_cache()
+
+        best = candidates[order[0]]
+        return best, float(losses[order[0]]), history
+
+    def _save_cache(self):
+        if self.cache_path:
+            with open(self.cache_path, "w") as f:
+                json.dump(self.cache, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit RealisticGuitarStringModel parameters to a recording")
+    parser.add_argument("reference", help="reference guitar recording (one note)")
+    parser.add_argument("--freq", type=float, default=58.27, help="fundamental of the reference note in Hz")
+    parser.add_argument("--velocity", type=float, default=0.7)
+    parser.add_argument("--palm-mute", action="store_true")
+    parser.add_argument("--start", type=float, default=0.0, help="note onset in the reference, seconds")
+    parser.add_argument("--duration", type=float, default=1.0, help="seconds compared at the last rung")
+    parser.add_argument("--candidates", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", default="fit_cache.json")
+    parser.add_argument("--output", default="fit_result.json")
+    args = parser.parse_args()
+
+    fitter = ParameterFitter(args.reference, args.freq, velocity=args.velocity, palm_mute=args.palm_mute,
+                             start=args.start, duration=args.duration, workers=args.workers,
+                             seed=args.seed, cache_path=args.cache)
+    best, loss, history = fitter.fit(fitter.sample_candidates(args.candidates))
+
+    print(f"Best loss: {loss:.2f}")
+    for name, value in best.items():
+        print(f"  {name}: {value:.6g}")
+
+    with open(args.output, "w") as f:
+        json.dump({"loss": loss, "parameters": best, "overrides": candidate_overrides(best),
+                   "history": history}, f, indent=2)
+    print(f"Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
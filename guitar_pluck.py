@@ -2,6 +2,9 @@ import numpy as np
 
 
 from scipy.io.wavfile import write
+from scipy.signal import lfilter
+
+from string_filter import feedback_polynomial, polynomial_input
 
 # Parameters
 sample_rate = 44100  # Samples per second
@@ -17,17 +20,11 @@ delay_line_length = int(sample_rate / frequency)
 # Initialize the delay line with random noise
 delay_line = np.random.uniform(-1, 1, delay_line_length)
 
-# Initialize the output array
-output = np.zeros(num_samples)
-
-# Karplus-Strong loop
-for i in range(num_samples):
-    # The current sample is the average of the first two samples in the delay line
-    output[i] = delay_line[0]
-    avg = 0.5 * (delay_line[0] + delay_line[1])
-    # Shift the delay line and apply the damping factor
-    delay_line[:-1] = delay_line[1:]
-    delay_line[-1] = avg * 0.996  # Damping factor to simulate energy loss
+# Karplus-Strong loop as one recursive filter: every sample is the damped
+# average of the samples one delay line length and one less back
+damping = 0.996  # Damping factor to simulate energy loss
+b, a = feedback_polynomial(delay_line_length, damping)
+output = lfilter(b, a, polynomial_input(delay_line, damping, 1.0, num_samples))
 
 # Normalize the output to the range of int16
 output = np.int16(output / np.max(np.abs(output)) * 32767)
@@ -0,0 +1,255 @@
+"""In-place, block-wise post-processing shared by the string models
+
+The models' post-chains used to build a fresh full-length array for every
+step: a time vector per stage, a sine and an envelope per partial, hum and
+noise vectors, filter outputs, and temporaries for normalization. The
+helpers here instead update the note in place, one BLOCK_SIZE slice at a
+time, with small per-thread scratch buffers and `out=` arguments, so a
+post-chain needs the note itself plus a few blocks. Each block goes through
+all of a helper's steps while it is still in cache.
+
+Every helper keeps the original element-wise operation order, and block
+filters carry their state, so float64 output matches the full-array code
+to within one rounding step.
+"""
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+from scipy.fft import irfft, next_fast_len, rfft
+from scipy.signal import lfilter, sosfilt
+
+
+BLOCK_SIZE = 16384
+
+_local = threading.local()
+
+
+def _scratch(dtype, count):
+    """`count` reusable BLOCK_SIZE buffers for this thread and dtype"""
+    buffers = getattr(_local, "buffers", None)
+    if buffers is None:
+        buffers = _local.buffers = {}
+    key = np.dtype(dtype)
+    if key not in buffers or len(buffers[key]) < count:
+        buffers[key] = [np.empty(BLOCK_SIZE, dtype=key) for _ in range(max(count, 3))]
+    return buffers[key][:count]
+
+
+def _ramp(dtype):
+    ramps = getattr(_local, "ramps", None)
+    if ramps is None:
+        ramps = _local.ramps = {}
+    key = np.dtype(dtype)
+    if key not in ramps:
+        ramps[key] = np.arange(BLOCK_SIZE, dtype=key)
+    return ramps[key]
+
+
+def blocks(num_samples):
+    for start in range(0, num_samples, BLOCK_SIZE):
+        yield start, min(num_samples, start + BLOCK_SIZE)
+
+
+def _time_block(t, start, end, fs, dtype):
+    """Same values as time_vector(n, fs, dtype)[start:end], written into t"""
+    t = t[:end - start]
+    np.add(_ramp(dtype)[:end - start], start, out=t)
+    np.divide(t, dtype.type(fs), out=t)
+    return t
+
+
+def peak(signal):
+    """max(abs(signal)) without an abs() temporary"""
+    if len(signal) == 0:
+        return 0.0
+    return max(float(signal.max()), -float(signal.min()))
+
+
+def normalize(signal, level):
+    """signal / peak * level, in place"""
+    signal_peak = peak(signal)
+    if signal_peak > 0:
+        np.divide(signal, signal_peak, out=signal)
+        np.multiply(signal, level, out=signal)
+    return signal
+
+
+def normalize_asymmetric(signal, scale, asymmetry_factor, clip_level):
+    """Peak-normalize to `scale`, boost positive half-waves, clip; in place"""
+    signal_peak = peak(signal)
+    if signal_peak > 0:
+        for start, end in blocks(len(signal)):
+            block = signal[start:end]
+            np.divide(block, signal_peak, out=block)
+            np.multiply(block, scale, out=block)
+            np.multiply(block, asymmetry_factor, out=block, where=block > 0)
+            np.clip(block, -clip_level, clip_level, out=block)
+    return signal
+
+
+def add_partials(signal, fs, partials):
+    """signal += sum of amplitude * sin(omega * t) * exp(-t * decay), in place
+
+    partials is a list of (omega, amplitude, decay) with omega in rad/s;
+    decay None means no envelope. t is computed once per block and shared.
+    """
+    dtype = signal.dtype
+    t, partial, envelope = _scratch(dtype, 3)
+    for start, end in blocks(len(signal)):
+        n = end - start
+        tb = _time_block(t, start, end, fs, dtype)
+        pb, eb = partial[:n], envelope[:n]
+        for omega, amplitude, decay in partials:
+            np.multiply(tb, omega, out=pb)
+            np.sin(pb, out=pb)
+            np.multiply(pb, amplitude, out=pb)
+            if decay is not None:
+                np.negative(tb, out=eb)
+                np.multiply(eb, decay, out=eb)
+                np.exp(eb, out=eb)
+                pb *= eb
+            signal[start:end] += pb
+    return signal
+
+
+def filter_in_place(signal, b=None, a=None, sos=None):
+    """lfilter(b, a, signal) or sosfilt(sos, signal), written back into signal
+
+    Filter state is carried between blocks, so the result is the same as
+    one call over the whole note starting from rest.
+    """
+    if sos is not None:
+        zi = np.zeros((len(sos), 2), dtype=signal.dtype)
+        for start, end in blocks(len(signal)):
+            signal[start:end], zi = sosfilt(sos, signal[start:end], zi=zi)
+    else:
+        zi = np.zeros(max(len(a), len(b)) - 1, dtype=signal.dtype)
+        for start, end in blocks(len(signal)):
+            signal[start:end], zi = lfilter(b, a, signal[start:end], zi=zi)
+    return signal
+
+
+def convolve_in_place(signal, impulse_response):
+    """convolve(signal, impulse_response)[:len(signal)], written back into signal
+
+    Overlap-add with the impulse response's spectrum computed once. Each
+    step only needs its own input block plus the carried tail, so output
+    overwrites input as it goes; memory scales with the impulse response
+    length, not the note length.
+    """
+    taps = len(impulse_response)
+    step = max(BLOCK_SIZE, 2 * taps)
+    nfft = next_fast_len(step + taps - 1, real=True)
+    response = rfft(impulse_response, nfft)
+    tail = np.zeros(taps - 1, dtype=signal.dtype)
+    for start in range(0, len(signal), step):
+        end = min(len(signal), start + step)
+        block = irfft(rfft(signal[start:end], nfft) * response, nfft)[:end - start + taps - 1]
+        block[:taps - 1] += tail
+        signal[start:end] = block[:end - start]
+        tail = block[end - start:]
+    return signal
+
+
+def saturate(signal, gain, level):
+    """tanh(signal * gain) * level, in place"""
+    np.multiply(signal, gain, out=signal)
+    np.tanh(signal, out=signal)
+    np.multiply(signal, level, out=signal)
+    return signal
+
+
+def add_filtered_noise(signal, b, a, noise_level, rng=np.random):
+    """signal += lfilter(b, a, noise_level * normal noise), in place
+
+    Noise is drawn block by block from the same stream, so the draws match
+    one full-length normal() call.
+    """
+    dtype = signal.dtype
+    zi = np.zeros(max(len(a), len(b)) - 1, dtype=dtype)
+    for start, end in blocks(len(signal)):
+        noise = (noise_level * rng.normal(0, 1, end - start)).astype(dtype)
+        noise, zi = lfilter(b, a, noise, zi=zi)
+        signal[start:end] += noise
+    return signal
+
+
+# === Allocation benchmark ===
+
+def measure(func, *args):
+    """(result, peak traced bytes above the starting point, seconds)"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - t0
+    peak_bytes = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return result, peak_bytes, elapsed
+
+
+def benchmark(duration=4.0, fundamental_freq=110.0, seed=0):
+    """Peak memory of each model's post-chain, in multiples of the note size
+
+    The string loop output is rendered outside the measurement; everything
+    after it (body, harmonics, DI, normalization) is measured as one call.
+    NumPy reports its buffers to tracemalloc, so the peak covers every
+    temporary array.
+    """
+    from DI_palm_mutes_random import GuitarStringModel
+    from better_claude_Bb import ImprovedGuitarStringModel
+    from claude_ultra_realistic_guitar import RealisticGuitarStringModel
+
+    def basic(model, signal):
+        signal = model._add_body_resonance(signal, fundamental_freq)
+        return model._normalize(model._di_processing(signal))
+
+    def improved(model, signal):
+        signal = model._add_enhanced_body_resonance(signal, fundamental_freq)
+        signal = model._add_realistic_harmonics(signal, fundamental_freq)
+        return model._normalize(model._enhanced_di_processing(signal))
+
+    def realistic(model, signal):
+        signal = model._add_realistic_harmonics_v2(signal, fundamental_freq)
+        signal = model._add_spectral_richness(signal, fundamental_freq)
+        return model._normalize_like_natural(signal)
+
+    report = []
+    for model_class, chain in [(GuitarStringModel, basic), (ImprovedGuitarStringModel, improved),
+                               (RealisticGuitarStringModel, realistic)]:
+        np.random.seed(seed)
+        model = model_class()
+        delay_line = model._excitation(fundamental_freq, 0.7)
+        if model_class is GuitarStringModel:
+            signal = model._string_loop(delay_line, duration, False)
+        else:
+            signal = model._string_loop(delay_line, fundamental_freq, duration, 0.7, False)
+        # Warm caches (body IR, sines) outside the measurement, with the same draws
+        state = np.random.get_state()
+        chain(model, signal.copy())
+        np.random.set_state(state)
+
+        _, peak_bytes, elapsed = measure(chain, model, signal)
+        report.append({
+            "model": model_class.__name__,
+            "note_bytes": signal.nbytes,
+            "peak_bytes": peak_bytes,
+            # The note itself plus everything the chain allocated on top of it
+            "peak_notes": 1 + peak_bytes / signal.nbytes,
+            "seconds": elapsed,
+        })
+    return report
+
+
+def main():
+    print("Post-chain peak memory, including the note itself (4 s note)")
+    for row in benchmark():
+        print(f"  {row['model']:28s} {row['peak_notes']:5.2f}x note "
+              f"({row['peak_bytes'] / 2 ** 20:6.2f} MB)  {row['seconds'] * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Float32/float64 precision mode shared by the string models
+
+Pass dtype=np.float32 to a model to keep delay lines, time vectors,
+oscillator banks, filter coefficients and outputs in float32. NumPy
+promotes float32 arrays to float64 whenever a float64 array or NumPy
+float64 scalar (e.g. the result of np.exp on a Python float) enters an
+expression, so every stage calls check_dtype on its result.
+
+Numerically sensitive recursive filters:
+- The DI high-passes (30-40 Hz) and the 85-250 Hz body band-passes have
+  poles very close to the unit circle. In transfer-function (b, a) form
+  float32 rounding of the coefficients moves those poles noticeably, so
+  they are run as second-order sections, which stay accurate in float32.
+- The Karplus-Strong loop itself is a long feedback recursion; it stays
+  stable in float32 because every pass multiplies by a damping < 1, but
+  its rounding error is what dominates the float32/float64 difference.
+- Oscillators take sin(2*pi*f*t) of a float32 time vector, so phase error
+  grows with note length (around 1e-3 rad after 2 s at 4 kHz).
+"""
+import numpy as np
+
+
+SUPPORTED_DTYPES = (np.dtype(np.float32), np.dtype(np.float64))
+
+# Largest float32 vs float64 difference we treat as inaudible,
+# as error RMS relative to the float64 signal RMS
+AUDIBLE_DIFFERENCE_DB = -60.0
+
+
+def resolve_dtype(dtype):
+    dtype = np.dtype(dtype)
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported precision {dtype}; use float32 or float64")
+    return dtype
+
+
+def check_dtype(signal, dtype, stage):
+    """Raise if a stage silently promoted (or demoted) the signal"""
+    if signal.dtype != dtype:
+        raise TypeError(f"{stage} produced {signal.dtype}, expected {dtype}")
+    return signal
+
+
+def time_vector(num_samples, fs, dtype):
+    return np.arange(num_samples, dtype=dtype) / dtype.type(fs)
+
+
+def relative_error_db(reference, test):
+    """Error RMS relative to the reference RMS, in dB"""
+    reference = np.asarray(reference, dtype=np.float64)
+    error = reference - np.asarray(test, dtype=np.float64)
+    ref_rms = np.sqrt(np.mean(reference ** 2))
+    err_rms = np.sqrt(np.mean(error ** 2))
+    if err_rms == 0:
+        return -np.inf
+    return 20 * np.log10(err_rms / ref_rms)
+
+
+def compare_precision(model_class, fundamental_freq, seed=0, fs=44100, **pluck_kwargs):
+    """Render the same seeded note in float64 and float32 and return the error in dB"""
+    outputs = []
+    for dtype in SUPPORTED_DTYPES:
+        np.random.seed(seed)
+        model = model_class(fs, dtype=dtype)
+        output = model.pluck(fundamental_freq, **pluck_kwargs)
+        check_dtype(output, dtype, model_class.__name__)
+        outputs.append(output)
+    return relative_error_db(outputs[1], outputs[0])
+
+
+def main():
+    from DI_palm_mutes_random import GuitarStringModel
+    from better_claude_Bb import ImprovedGuitarStringModel
+    from claude_ultra_realistic_guitar import RealisticGuitarStringModel
+
+    print(f"float32 vs float64, threshold {AUDIBLE_DIFFERENCE_DB} dB")
+    failed = False
+    for model_class in [GuitarStringModel, ImprovedGuitarStringModel, RealisticGuitarStringModel]:
+        for freq, palm_mute in [(58.27, False), (110.0, True), (329.63, False)]:
+            error = compare_precision(model_class, freq, duration=1.0, velocity=0.7, palm_mute=palm_mute)
+            ok = error < AUDIBLE_DIFFERENCE_DB
+            failed |= not ok
+            print(f"  {model_class.__name__:28s} {freq:7.2f} Hz  {error:7.1f} dB  {'ok' if ok else 'FAIL'}")
+
+    if failed:
+        raise SystemExit("float32 output differs audibly from float64")
+
+
+if __name__ == "__main__":
+    main()
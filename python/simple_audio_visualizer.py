@@ -1,4 +1,7 @@
 #copyied from https://gitlab.com/avirzayev/medium-audio-visualizer-code/-/blob/master/main.py
+import json
+import time
+
 import librosa
 import numpy as np
 import pygame
@@ -46,13 +49,100 @@ class AudioBar:
         pygame.draw.rect(screen, self.color, (self.x, self.y + self.max_height - self.height, self.width, self.height))
 
 
+class FrameTimer:
+    """Per-stage frame timings kept in a fixed-size ring buffer"""
+
+    STAGES = ("events", "get_decibel", "update", "draw", "flip")
+
+    def __init__(self, capacity=4096, target_fps=60, hist_bins_ms=(2, 4, 8, 16.7, 33.3, 50, 100)):
+        self.capacity = capacity
+        self.frame_budget = 1.0 / target_fps
+        self.hist_bins_ms = hist_bins_ms
+
+        # Preallocated so recording a frame never allocates
+        self.timings = np.zeros((capacity, len(self.STAGES)))
+        self.drift = np.zeros(capacity)
+        self.frames = 0
+        self.missed_deadlines = 0
+        self.startup = {}
+
+        self._stage = 0
+        self._last = 0.0
+
+    def start_frame(self):
+        self._stage = 0
+        self._last = time.perf_counter()
+
+    def mark(self):
+        """Close the current stage; stages are recorded in STAGES order"""
+        now = time.perf_counter()
+        self.timings[self.frames % self.capacity, self._stage] = now - self._last
+        self._stage += 1
+        self._last = now
+
+    def end_frame(self, playback_time, shown_time):
+        row = self.frames % self.capacity
+        # Positive drift means the bars show audio older than what is playing
+        self.drift[row] = playback_time - shown_time
+        if self.timings[row].sum() > self.frame_budget:
+            self.missed_deadlines += 1
+        self.frames += 1
+
+    def summary(self):
+        n = min(self.frames, self.capacity)
+        timings_ms = self.timings[:n] * 1000.0
+        totals_ms = timings_ms.sum(axis=1)
+        drift_ms = self.drift[:n] * 1000.0
+
+        def stats(values):
+            if len(values) == 0:
+                return {}
+            return {
+                "mean": float(np.mean(values)),
+                "p50": float(np.percentile(values, 50)),
+                "p95": float(np.percentile(values, 95)),
+                "max": float(np.max(values)),
+            }
+
+        counts, _ = np.histogram(totals_ms, bins=(0,) + tuple(self.hist_bins_ms) + (np.inf,))
+        return {
+            "frames": self.frames,
+            "frames_in_buffer": n,
+            "frame_budget_ms": self.frame_budget * 1000.0,
+            "missed_deadlines": self.missed_deadlines,
+            "startup_s": self.startup,
+            "stages_ms": {stage: stats(timings_ms[:, i]) for i, stage in enumerate(self.STAGES)},
+            "frame_ms": stats(totals_ms),
+            "frame_ms_histogram": {
+                "bin_edges": [0] + list(self.hist_bins_ms) + ["inf"],
+                "counts": counts.tolist(),
+            },
+            "drift_ms": stats(drift_ms),
+        }
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+# Set to True to record per-stage frame timings and write them to PROFILE_OUTPUT on exit
+PROFILE_FRAMES = False
+PROFILE_OUTPUT = "frame_timings.json"
+timer = FrameTimer() if PROFILE_FRAMES else None
+
+
 filename = "D:\\MusicProduction\\URM Notes\\EQ Training\\Audio\\Level1_Exercise3_1EQMove_Combo\\OH.wav"# "music3.wav"
 #filename = "D:\\Music\\Accept\\Blood of the Nations\\03 Track 3.wma"
 filename = "D:\\Music\\mp3s\\finalproduct.mp3"
+t0 = time.perf_counter()
 time_series, sample_rate = librosa.load(filename)  # getting information from the file
+t1 = time.perf_counter()
 
 # getting a matrix which contains amplitude values according to frequency and time indexes
 stft = np.abs(librosa.stft(time_series, hop_length=512, n_fft=2048*4))
+if timer is not None:
+    timer.startup["decode"] = t1 - t0
+    timer.startup["stft"] = time.perf_counter() - t1
 
 spectrogram = librosa.amplitude_to_db(stft, ref=np.max)  # converting the matrix to decibel matrix
 
@@ -70,6 +160,11 @@ def get_decibel(target_time, freq):
     return spectrogram[int(freq * frequencies_index_ratio)][int(target_time * time_index_ratio)]
 
 
+def shown_frame_time(target_time):
+    """Time of the spectrogram frame get_decibel picks for target_time"""
+    return times[min(int(target_time * time_index_ratio), len(times) - 1)]
+
+
 pygame.init()
 
 infoObject = pygame.display.Info()
@@ -112,6 +207,9 @@ while running:
     deltaTime = (t - getTicksLastFrame) / 1000.0
     getTicksLastFrame = t
 
+    if timer is not None:
+        timer.start_frame()
+
     # Did the user click the window close button?
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
@@ -120,12 +218,38 @@ while running:
     # Fill the background with white
     screen.fill((255, 255, 255))
 
+    if timer is None:
+        for b in bars:
+            b.update(deltaTime, get_decibel(pygame.mixer.music.get_pos()/1000.0, b.freq))
+            b.render(screen)
+
+        # Flip the display
+        pygame.display.flip()
+        continue
+
+    # Instrumented frame: same work, split into stages so each can be timed
+    timer.mark()
+
+    lookup_time = pygame.mixer.music.get_pos()/1000.0
+    decibels = [get_decibel(lookup_time, b.freq) for b in bars]
+    timer.mark()
+
+    for b, decibel in zip(bars, decibels):
+        b.update(deltaTime, decibel)
+    timer.mark()
+
     for b in bars:
-        b.update(deltaTime, get_decibel(pygame.mixer.music.get_pos()/1000.0, b.freq))
         b.render(screen)
+    timer.mark()
 
-    # Flip the display
     pygame.display.flip()
+    timer.mark()
+
+    timer.end_frame(pygame.mixer.music.get_pos()/1000.0, shown_frame_time(lookup_time))
 
 # Done! Time to quit.
 pygame.quit()
+
+if timer is not None:
+    timer.dump(PROFILE_OUTPUT)
+    print(f"Frame timings written to {PROFILE_OUTPUT}")
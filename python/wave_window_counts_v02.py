@@ -22,12 +22,16 @@ plt.plot(x[10000:20010])
 type(x) 
 len(x)
 
-x1 = np.zeros(len(x))
-x2 = np.zeros(len(x))
-x3 = np.zeros(len(x))
-x4 = np.zeros(len(x))
-x5 = np.zeros(len(x))
-x1[0:(len(x) - 1)] = np.diff(x)
+# Sample diffs of 16-bit audio are integers below 2**17, so float32 holds
+# them exactly at half the memory of float64. The diff is taken after the
+# cast: in int16 it would wrap (-32768 - 32767 gives 1)
+dtype = np.float32
+x1 = np.zeros(len(x), dtype=dtype)
+x2 = np.zeros(len(x), dtype=dtype)
+x3 = np.zeros(len(x), dtype=dtype)
+x4 = np.zeros(len(x), dtype=dtype)
+x5 = np.zeros(len(x), dtype=dtype)
+x1[0:(len(x) - 1)] = np.diff(np.asarray(x, dtype=dtype))
 x2[0:(len(x) - 2)] = x1[1:(len(x) - 1)]
 x3[0:(len(x) - 4)] = x1[2:(len(x) - 2)]
 x4[0:(len(x) - 6)] = x1[3:(len(x) - 3)]
@@ -0,0 +1,246 @@
+import queue
+import time
+
+import numpy as np
+import soundfile as sf
+from scipy.signal import butter, lfilter
+
+from string_filter import OnePole, loop_chunk
+
+
+class Voice:
+    """One Karplus-Strong string with its own preallocated buffers"""
+
+    def __init__(self, max_delay, block_size):
+        # One guard sample past the end mirrors position 0, so the sample
+        # after the last one is always the next slot in memory
+        self.delay_line = np.zeros(max_delay + 1)
+        self.averaged = np.zeros(block_size)
+        self.envelope = np.zeros(max_delay)
+        self.lowpass = OnePole(block_size)
+
+        self.freq = None
+        self.length = 0
+        self.pos = 0
+        self.damping = 0.0
+        self.active = False
+        self.released = False
+        self.started = 0  # block counter at note-on, used for stealing
+
+    def render(self, out, frames):
+        """Add `frames` samples of this string into `out`"""
+        d = self.delay_line
+        n = self.length
+        done = 0
+        while done < frames:
+            # Chunks shorter than the delay line only read values written
+            # on the previous pass, so each one can be filtered in one call
+            k = min(frames - done, n - 1, n - self.pos)
+            p = self.pos
+            current = d[p:p + k]
+
+            np.add(out[done:done + k], current, out=out[done:done + k])
+
+            # Same step as the offline loops, written back into the ring
+            loop_chunk(current, d[p + 1:p + k + 1], self.lowpass, self.damping, current, self.averaged[:k])
+            if p == 0:
+                d[n] = d[0]
+
+            self.pos = (p + k) % n
+            done += k
+
+    def peak(self):
+        line = self.delay_line[:self.length]
+        return max(line.max(), -line.min())
+
+
+class RealtimeGuitarEngine:
+    """Block-based Karplus-Strong engine driven by a note event queue
+
+    note_on/note_off may be called from any thread; events are applied
+    at the start of the next block, so input latency is one block. Pitches
+    must lie between lowest_freq, which sizes the delay lines, and fs/2.
+    """
+
+    def __init__(self, fs=44100, block_size=256, max_voices=8, lowest_freq=40.0):
+        if not 64 <= block_size <= 512:
+            raise ValueError("block_size must be between 64 and 512 samples")
+
+        self.fs = fs
+        self.block_size = block_size
+        self.max_voices = max_voices
+        self.lowest_freq = lowest_freq
+        self.events = queue.SimpleQueue()
+        self.block_count = 0
+
+        # Same string constants as GuitarStringModel
+        self.damping = 0.9985
+        self.palm_mute_damping = 0.1
+        self.release_damping = 0.9
+        self.lp_coeff = 0.5
+        self.silence_threshold = 1e-4
+
+        max_delay = int(fs / lowest_freq) + 1
+        self.voices = [Voice(max_delay, block_size) for _ in range(max_voices)]
+
+        # Pre-filtered excitation noise so note-on only copies a slice
+        b, a = butter(2, 6000 / (fs / 2), btype='low')
+        self.noise_table = lfilter(b, a, np.random.uniform(-1, 1, fs))
+        self.ramp = np.arange(max_delay, dtype=float)
+
+    # --- Event interface -------------------------------------------------
+
+    def note_on(self, freq, velocity=1.0, palm_mute=False):
+        # Checked here rather than in the callback, so the caller gets the error
+        if not self.lowest_freq <= freq <= self.fs / 2:
+            raise ValueError(f"freq must be between {self.lowest_freq} and {self.fs / 2} Hz, got {freq}")
+        self.events.put(("note_on", freq, velocity, palm_mute))
+
+    def note_off(self, freq):
+        self.events.put(("note_off", freq, 0.0, False))
+
+    def _handle_events(self):
+        while True:
+            try:
+                kind, freq, velocity, palm_mute = self.events.get_nowait()
+            except queue.Empty:
+                return
+            if kind == "note_on":
+                self._start_voice(self._allocate_voice(freq), freq, velocity, palm_mute)
+            else:
+                for voice in self.voices:
+                    if voice.active and voice.freq == freq and not voice.released:
+                        voice.released = True
+                        voice.damping = min(voice.damping, self.release_damping)
+
+    def _allocate_voice(self, freq):
+        """Free voice, else retrigger the same pitch, else steal the oldest"""
+        for voice in self.voices:
+            if not voice.active:
+                return voice
+        for voice in self.voices:
+            if voice.freq == freq:
+                return voice
+        # Prefer stealing released voices, oldest first
+        return min(self.voices, key=lambda v: (not v.released, v.started))
+
+    def _start_voice(self, voice, freq, velocity, palm_mute):
+        n = int(np.round(self.fs / freq))
+        d = voice.delay_line[:n]
+        env = voice.envelope[:n]
+
+        start = np.random.randint(0, len(self.noise_table) - n)
+        np.multiply(self.noise_table[start:start + n], velocity, out=d)
+
+        # Randomized attack envelope decay, as in GuitarStringModel.pluck
+        decay_rate = np.random.uniform(0.07, 0.13) * max(n, 100)
+        np.multiply(self.ramp[:n], -1.0 / decay_rate, out=env)
+        np.exp(env, out=env)
+        np.multiply(d, env, out=d)
+        voice.delay_line[n] = d[0]
+
+        lp_coeff = self.lp_coeff * np.random.uniform(0.95, 1.05)
+        voice.lowpass.set(lp_coeff)
+
+        base_damping = self.palm_mute_damping if palm_mute else self.damping
+        # Clipped like GuitarStringModel: above 1 the loop gain exceeds 1 and
+        # the note grows instead of decaying
+        voice.damping = min(base_damping * np.random.uniform(0.995, 1.005), 1.0)
+
+        voice.freq = freq
+        voice.length = n
+        voice.pos = 0
+        voice.active = True
+        voice.released = False
+        voice.started = self.block_count
+
+    # --- Audio callback --------------------------------------------------
+
+    def callback(self, out):
+        """Fill `out` (length block_size) with the next block of audio"""
+        self._handle_events()
+        out[:] = 0.0
+        for voice in self.voices:
+            if not voice.active:
+                continue
+            voice.render(out, self.block_size)
+            if voice.peak() < self.silence_threshold:
+                voice.active = False
+        self.block_count += 1
+
+    def sounddevice_callback(self, outdata, frames, time_info, status):
+        """Adapter for sounddevice.OutputStream(blocksize=block_size, channels=1)"""
+        self.callback(outdata[:, 0])
+
+
+def run_offline(engine, events, duration):
+    """Drive the engine block by block and time every callback
+
+    `events` is a list of (time_s, kind, freq, velocity, palm_mute) with
+    kind "note_on" or "note_off". Returns the rendered audio and timing stats.
+    """
+    block_size = engine.block_size
+    num_blocks = int(np.ceil(duration * engine.fs / block_size))
+    output = np.zeros(num_blocks * block_size)
+    block_times = np.zeros(num_blocks)
+
+    pending = sorted(events, key=lambda e: e[0])
+    next_event = 0
+
+    for i in range(num_blocks):
+        block_start = i * block_size / engine.fs
+        while next_event < len(pending) and pending[next_event][0] <= block_start:
+            _, kind, freq, velocity, palm_mute = pending[next_event]
+            if kind == "note_on":
+                engine.note_on(freq, velocity, palm_mute)
+            else:
+                engine.note_off(freq)
+            next_event += 1
+
+        t0 = time.perf_counter()
+        engine.callback(output[i * block_size:(i + 1) * block_size])
+        block_times[i] = time.perf_counter() - t0
+
+    deadline = block_size / engine.fs
+    stats = {
+        "block_size": block_size,
+        "deadline_ms": deadline * 1000,
+        "worst_block_ms": block_times.max() * 1000,
+        "mean_block_ms": block_times.mean() * 1000,
+        "missed_deadlines": int(np.sum(block_times > deadline)),
+        "worst_case_load": block_times.max() / deadline,
+    }
+    return output, stats
+
+
+# Usage example
+def main():
+    fs = 44100
+    engine = RealtimeGuitarEngine(fs, block_size=256, max_voices=6)
+
+    E2, A2, D3, G3 = 82.41, 110.0, 146.83, 196.0
+    events = [
+        (0.0, "note_on", E2, 0.8, False),
+        (0.5, "note_on", A2, 0.6, False),
+        (1.0, "note_on", D3, 0.7, False),
+        (1.2, "note_off", E2, 0.0, False),
+        (1.5, "note_on", G3, 0.5, False),
+        (2.0, "note_on", A2, 0.9, True),
+        (2.5, "note_off", D3, 0.0, False),
+    ]
+
+    output, stats = run_offline(engine, events, duration=3.5)
+
+    print("Block timing:")
+    for key, value in stats.items():
+        print(f"  {key}: {value:.3f}" if isinstance(value, float) else f"  {key}: {value}")
+
+    peak = np.max(np.abs(output))
+    if peak > 0:
+        output = output / peak * 0.8
+    sf.write('realtime_guitar.wav', output, fs)
+    print("Saved: realtime_guitar.wav")
+
+
+if __name__ == "__main__":
+    main()
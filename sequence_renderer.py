@@ -0,0 +1,110 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from DI_palm_mutes_random import GuitarStringModel
+
+
+class NoteEvent:
+    """One note in a phrase; onset and duration are in seconds"""
+
+    def __init__(self, onset, pitch, duration=1.0, velocity=1.0, palm_mute=False):
+        self.onset = onset
+        self.pitch = pitch
+        self.duration = duration
+        self.velocity = velocity
+        self.palm_mute = palm_mute
+
+
+def _render_note(args):
+    """Worker entry point; seeds each note so forked workers don't share noise
+
+    The note is rendered at full velocity without its own peak
+    normalization and then scaled by velocity, so velocity sets the note's
+    level in the mix. The model's velocity only scales the excitation, so
+    the string itself is the same; the body resonance and DI stages now
+    follow the note's level too. The caller's global RNG state is restored.
+    """
+    model, event, seed = args
+    state = np.random.get_state()
+    try:
+        np.random.seed(seed)
+        note = model.pluck(event.pitch, duration=event.duration, velocity=1.0,
+                           palm_mute=event.palm_mute, normalize=False)
+    finally:
+        np.random.set_state(state)
+    note *= event.velocity
+    return note
+
+
+class SequenceRenderer:
+    """Renders an event list by overlap-adding independently rendered notes
+
+    Notes may overlap and ring into each other. The output buffer is
+    allocated once from the latest note end, each note is added in place
+    at its sample-accurate onset, and the mix is normalized once; notes
+    are not normalized on their own, so their velocities set their levels.
+    """
+
+    def __init__(self, model, workers=1):
+        self.model = model
+        self.fs = model.fs
+        self.workers = workers
+
+    def render(self, events, tail=0.0, peak=0.8, seed=None):
+        if not events:
+            return np.zeros(0)
+
+        onsets = [int(np.round(e.onset * self.fs)) for e in events]
+        ends = [start + int(e.duration * self.fs) for start, e in zip(onsets, events)]
+        output = np.zeros(max(ends) + int(tail * self.fs))
+
+        seeds = np.random.SeedSequence(seed).generate_state(len(events))
+        tasks = [(self.model, event, int(s)) for event, s in zip(events, seeds)]
+
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                notes = pool.map(_render_note, tasks, chunksize=max(1, len(tasks) // (4 * self.workers)))
+                for start, note in zip(onsets, notes):
+                    output[start:start + len(note)] += note
+        else:
+            for start, task in zip(onsets, tasks):
+                note = _render_note(task)
+                output[start:start + len(note)] += note
+
+        # Single normalization pass over the finished mix
+        max_val = np.max(np.abs(output))
+        if peak is not None and max_val > 0:
+            output *= peak / max_val
+
+        return output
+
+
+# Usage example
+def main():
+    fs = 44100
+    renderer = SequenceRenderer(GuitarStringModel(fs), workers=4)
+
+    E2 = 82.41  # Low E
+    A2 = 110.0  # A string
+    D3 = 146.83  # D string
+
+    # Same notes as DI_palm_mutes_random.main, but overlapping
+    events = [
+        NoteEvent(0.0, E2, duration=0.4, velocity=0.3),
+        NoteEvent(0.3, E2, duration=1.0, velocity=0.8),
+        NoteEvent(1.1, A2, duration=1.5, velocity=0.6, palm_mute=True),
+        NoteEvent(1.4, D3, duration=2.0, velocity=0.1),
+    ]
+
+    print("Rendering sequence...")
+    output = renderer.render(events, seed=0)
+
+    print(f"Generated {len(output) / fs:.1f} seconds of audio")
+    sf.write('sequence.wav', output, fs)
+    print("Saved: sequence.wav")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import soundfile as sf
+from scipy.signal import sosfilt
+
+from audio_features import BANDS, audio_files
+
+
+# Third-octave centres from 20 Hz to 20 kHz
+THIRD_OCTAVE_CENTRES = 1000 * 2 ** (np.arange(-17, 14) / 3)
+
+
+def k_weighting(fs):
+    """BS.1770 K-weighting (high shelf + high-pass) as SOS for any sample rate
+
+    Analog prototypes fitted to the standard's 48 kHz coefficients, so other
+    rates get the same response instead of reusing the 48 kHz numbers.
+    """
+    # High shelf: about +4 dB above 1.5 kHz
+    K = np.tan(np.pi * 1681.974450955533 / fs)
+    Q = 0.7071752369554196
+    Vh = 10 ** (3.999843853973347 / 20)
+    Vb = Vh ** 0.4996667741545416
+    shelf = [Vh + Vb * K / Q + K ** 2, 2 * (K ** 2 - Vh), Vh - Vb * K / Q + K ** 2,
+             1 + K / Q + K ** 2, 2 * (K ** 2 - 1), 1 - K / Q + K ** 2]
+
+    # High-pass at about 38 Hz; the standard keeps the numerator at [1, -2, 1]
+    K = np.tan(np.pi * 38.13547087602444 / fs)
+    Q = 0.5003270373238773
+    a0 = 1 + K / Q + K ** 2
+    highpass = [a0, -2 * a0, a0, a0, 2 * (K ** 2 - 1), 1 - K / Q + K ** 2]
+
+    sos = np.array(shelf + highpass).reshape(2, 6)
+    return sos / sos[:, 3:4]
+
+
+class _Resolution:
+    """Running STFT state for one frame size over a stream of blocks"""
+
+    def __init__(self, frame_size, fs, band_edges):
+        self.frame_size = frame_size
+        self.hop = frame_size // 4
+        self.window = np.hanning(frame_size).astype(np.float32)
+        # One-sided bin power scaled so the bins of a frame sum to its mean square
+        self.scale = 2.0 / (frame_size * np.sum(self.window.astype(float) ** 2))
+        freqs = np.fft.rfftfreq(frame_size, 1 / fs)
+        self.band_matrix = np.stack([(freqs >= lo) & (freqs < hi) for lo, hi in band_edges],
+                                    axis=1).astype(np.float32)
+        self.power_sum = np.zeros(frame_size // 2 + 1)
+        self.frames = 0
+        self.next_start = 0
+
+    def consume(self, buffer, buffer_start):
+        """Power spectra of every whole frame now in the buffer, with their centres"""
+        first = self.next_start - buffer_start
+        count = (len(buffer) - first - self.frame_size) // self.hop + 1
+        if count <= 0:
+            return None, None
+        frames = np.lib.stride_tricks.sliding_window_view(buffer[first:], self.frame_size)[::self.hop][:count]
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+        power *= self.scale
+        self.power_sum += power.sum(axis=0)
+        self.frames += count
+
+        centres = self.next_start + self.frame_size // 2 + np.arange(count) * self.hop
+        self.next_start += count * self.hop
+        return power, centres
+
+    def long_term_bands_db(self):
+        """Mean power per third-octave band in dB; NaN for bands without bins"""
+        if self.frames == 0:
+            return np.full(self.band_matrix.shape[1], np.nan)
+        mean_power = self.power_sum / self.frames
+        band_power = mean_power @ self.band_matrix
+        with np.errstate(divide="ignore"):
+            db = 10 * np.log10(band_power + 1e-20)
+        db[self.band_matrix.sum(axis=0) == 0] = np.nan
+        return db
+
+
+class SpectralAnalyzer:
+    """Multi-resolution STFT summary of one audio file in a single streaming pass
+
+    The file is read in blocks of `block_size` samples and only a tail of
+    up to the largest frame size is carried between blocks, so memory does
+    not depend on file length. Per file it produces:
+
+      - a long-term third-octave spectrum per STFT resolution (small frames
+        follow transients, large frames resolve the low bands),
+      - energy in `bands` over time from the `band_resolution` frames,
+      - BS.1770 momentary (400 ms) and short-term (3 s) loudness curves and
+        gated integrated loudness,
+
+    all on a common time grid of `step` seconds.
+    """
+
+    def __init__(self, resolutions=(256, 2048, 16384), band_resolution=2048, bands=BANDS,
+                 step=0.1, block_size=2 ** 16):
+        if band_resolution not in resolutions:
+            raise ValueError(f"band_resolution {band_resolution} is not one of {resolutions}")
+        self.resolutions = resolutions
+        self.band_resolution = band_resolution
+        self.bands = bands
+        self.step = step
+        self.block_size = block_size
+
+    def analyze(self, path):
+        """Returns (file summary dict, per-step dict of arrays)"""
+        with sf.SoundFile(path) as f:
+            fs, channels = f.samplerate, f.channels
+            step_samples = int(round(self.step * fs))
+            num_steps = f.frames // step_samples + 2
+
+            third_octaves = [(c * 2 ** (-1 / 6), c * 2 ** (1 / 6)) for c in THIRD_OCTAVE_CENTRES]
+            stft = {n: _Resolution(n, fs, third_octaves) for n in self.resolutions}
+            band_res = stft[self.band_resolution]
+            freqs = np.fft.rfftfreq(self.band_resolution, 1 / fs)
+            band_matrix = np.stack([(freqs >= lo) & (freqs < (hi or np.inf)) for lo, hi in self.bands],
+                                   axis=1).astype(np.float32)
+
+            band_sums = np.zeros((num_steps, len(self.bands)))
+            band_counts = np.zeros(num_steps)
+            loudness_sums = np.zeros(num_steps)
+            sample_counts = np.zeros(num_steps)
+
+            sos = k_weighting(fs)
+            zi = np.zeros((len(sos), 2, channels))
+            peak = 0.0
+            square_sum = 0.0
+            position = 0
+
+            buffer = np.zeros(0, dtype=np.float32)
+            buffer_start = 0
+
+            for block in f.blocks(self.block_size, dtype="float32", always_2d=True):
+                n = len(block)
+                peak = max(peak, float(np.max(np.abs(block))))
+
+                # Loudness: K-weighted power summed over channels, per step
+                weighted, zi = sosfilt(sos, block, axis=0, zi=zi)
+                first = position // step_samples
+                steps = np.minimum((position + np.arange(n)) // step_samples, num_steps - 1) - first
+                power = np.bincount(steps, np.sum(weighted.astype(float) ** 2, axis=1))
+                loudness_sums[first:first + len(power)] += power
+                sample_counts[first:first + len(power)] += np.bincount(steps)
+
+                mono = block.mean(axis=1)
+                square_sum += float(np.dot(mono, mono))
+                buffer = np.concatenate([buffer, mono])
+                position += n
+
+                for resolution in stft.values():
+                    power, centres = resolution.consume(buffer, buffer_start)
+                    if power is not None and resolution is band_res:
+                        steps = np.minimum(centres // step_samples, num_steps - 1)
+                        np.add.at(band_sums, steps, power @ band_matrix)
+                        np.add.at(band_counts, steps, 1)
+
+                # Keep only what the slowest resolution still needs
+                keep_from = min(r.next_start for r in stft.values())
+                buffer = buffer[keep_from - buffer_start:]
+                buffer_start = keep_from
+
+        used_steps = max(1, -(-position // step_samples))
+        summary = {
+            "path": path,
+            "fs": fs,
+            "channels": channels,
+            "duration": position / fs,
+            "peak_dbfs": 20 * np.log10(peak + 1e-20),
+            "rms_dbfs": 10 * np.log10(square_sum / max(position, 1) + 1e-20),
+        }
+        for n, resolution in stft.items():
+            summary[f"spectrum_{n}"] = resolution.long_term_bands_db().astype(np.float32)
+
+        mean_square = loudness_sums[:used_steps] / np.maximum(sample_counts[:used_steps], 1)
+        momentary, momentary_power = self._windowed_loudness(mean_square, 0.4)
+        short_term, _ = self._windowed_loudness(mean_square, 3.0)
+        summary["integrated_lufs"] = self._integrated_loudness(momentary_power)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            band_db = 10 * np.log10(band_sums[:used_steps] / band_counts[:used_steps, None] + 1e-20)
+        steps = {
+            "time": (np.arange(used_steps) * step_samples / fs).astype(np.float32),
+            "momentary_lufs": momentary.astype(np.float32),
+            "short_term_lufs": short_term.astype(np.float32),
+        }
+        for (lo, hi), column in zip(self.bands, band_db.T):
+            steps[f"band_{lo}_{hi or 'nyquist'}_db"] = column.astype(np.float32)
+        return summary, steps
+
+    def _windowed_loudness(self, mean_square, seconds):
+        """Loudness of the window ending at each step, in LUFS"""
+        width = max(1, int(round(seconds / self.step)))
+        power = np.convolve(mean_square, np.ones(width) / width)[:len(mean_square)]
+        # The first windows are not full yet; average over what there is
+        power *= width / np.minimum(np.arange(1, len(power) + 1), width)
+        return -0.691 + 10 * np.log10(power + 1e-20), power
+
+    @staticmethod
+    def _integrated_loudness(block_power):
+        """BS.1770 gated loudness over the 400 ms blocks"""
+        lufs = -0.691 + 10 * np.log10(block_power + 1e-20)
+        gated = block_power[lufs > -70]
+        if len(gated) == 0:
+            return -np.inf
+        relative_gate = -0.691 + 10 * np.log10(gated.mean()) - 10
+        gated = block_power[lufs > max(-70, relative_gate)]
+        return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+# === Process pool workers ===
+
+_worker = {}
+
+
+def _init_worker(settings):
+    _worker["analyzer"] = SpectralAnalyzer(**settings)
+
+
+def _analyze_file(path):
+    try:
+        return _worker["analyzer"].analyze(path), None
+    except Exception as e:  # one bad file must not end the whole run
+        return None, f"{path}: {type(e).__name__}: {e}"
+
+
+class ColumnarStore:
+    """files.parquet (one row per file) and steps.parquet (one row per time step)
+
+    Rows are buffered and written as row groups of about `rows_per_group`
+    files, so the writer's memory stays bounded however large the library.
+    """
+
+    def __init__(self, output_dir, resolutions, rows_per_group=256):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.rows_per_group = rows_per_group
+        self.metadata = {
+            "third_octave_centres": ",".join(f"{c:.1f}" for c in THIRD_OCTAVE_CENTRES),
+            "resolutions": ",".join(str(n) for n in resolutions),
+        }
+        self._files, self._steps = [], []
+        self._writers = {}
+
+    def add(self, summary, steps):
+        self._files.append(summary)
+        self._steps.append(steps)
+        if len(self._files) >= self.rows_per_group:
+            self.flush()
+
+    def _write(self, name, table):
+        writer = self._writers.get(name)
+        if writer is None:
+            table = table.replace_schema_metadata(self.metadata)
+            writer = pq.ParquetWriter(os.path.join(self.output_dir, f"{name}.parquet"), table.schema)
+            self._writers[name] = writer
+        writer.write_table(table.cast(writer.schema))
+
+    def flush(self):
+        if not self._files:
+            return
+        files = {key: [row[key] for row in self._files] for key in self._files[0]}
+        for key, values in files.items():
+            if isinstance(values[0], np.ndarray):
+                files[key] = pa.array(values, type=pa.list_(pa.float32()))
+        self._write("files", pa.table(files))
+
+        lengths = [len(s["time"]) for s in self._steps]
+        steps = {"path": pa.DictionaryArray.from_arrays(
+            np.repeat(np.arange(len(lengths), dtype=np.int32), lengths),
+            [row["path"] for row in self._files])}
+        for key in self._steps[0]:
+            steps[key] = np.concatenate([s[key] for s in self._steps])
+        self._write("steps", pa.table(steps))
+
+        self._files, self._steps = [], []
+
+    def close(self):
+        """Flush buffered rows and write the footers; the files are unreadable without them"""
+        try:
+            self.flush()
+        finally:
+            for writer in self._writers.values():
+                writer.close()
+            self._writers = {}
+
+
+def analyze_folder(folder, output_dir, workers=None, max_pending=None, **settings):
+    """Analyze every audio file under folder into a columnar store
+
+    At most `max_pending` files are queued or in flight at once, so a huge
+    folder is walked lazily instead of being submitted up front. A file
+    whose analysis raises is recorded in "failed"; if the run itself stops
+    (Ctrl-C, a crashed worker), the store is still closed so everything
+    written so far stays readable.
+    """
+    workers = workers or os.cpu_count()
+    max_pending = max_pending or 2 * workers
+    store = ColumnarStore(output_dir, settings.get("resolutions", SpectralAnalyzer().resolutions))
+    files = audio_files(folder)
+    done, failed, audio_seconds = 0, [], 0.0
+    t0 = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(settings,)) as pool:
+            pending = {}
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_pending:
+                    path = next(files, None)
+                    if path is None:
+                        exhausted = True
+                    else:
+                        pending[pool.submit(_analyze_file, path)] = path
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path = pending.pop(future)
+                    try:
+                        result, error = future.result()
+                    except Exception as e:  # e.g. BrokenProcessPool when a worker dies
+                        result, error = None, f"{path}: {type(e).__name__}: {e}"
+                    if error:
+                        failed.append(error)
+                        print(f"Skipped {error}", file=sys.stderr)
+                        continue
+                    store.add(*result)
+                    done += 1
+                    audio_seconds += result[0]["duration"]
+    finally:
+        store.close()
+
+    elapsed = time.perf_counter() - t0
+    return {"files": done, "failed": failed, "audio_seconds": audio_seconds, "seconds": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-resolution spectral summaries of an audio folder")
+    parser.add_argument("folder", help="folder to scan recursively for audio files")
+    parser.add_argument("--output", default="spectral_analysis", help="output folder for the parquet files")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-pending", type=int, default=None, help="files queued or in flight at once")
+    parser.add_argument("--resolutions", type=int, nargs="+", default=[256, 2048, 16384])
+    parser.add_argument("--band-resolution", type=int, default=2048)
+    parser.add_argument("--step", type=float, default=0.1, help="time step of the curves in seconds")
+    parser.add_argument("--block-size", type=int, default=2 ** 16, help="samples read per block")
+    args = parser.parse_args()
+
+    stats = analyze_folder(args.folder, args.output, args.workers, args.max_pending,
+                           resolutions=tuple(args.resolutions), band_resolution=args.band_resolution,
+                           step=args.step, block_size=args.block_size)
+
+    print(f"Analyzed {stats['files']} files ({stats['audio_seconds'] / 3600:.2f} h of audio) "
+          f"in {stats['seconds']:.1f} s, {len(stats['failed'])} skipped")
+    print(f"Saved: {os.path.join(args.output, 'files.parquet')}, {os.path.join(args.output, 'steps.parquet')}")
+
+
+if __name__ == "__main__":
+    main()
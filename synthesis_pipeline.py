@@ -0,0 +1,206 @@
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from DI_palm_mutes_random import GuitarStringModel
+from better_claude_Bb import ImprovedGuitarStringModel
+from claude_ultra_realistic_guitar import RealisticGuitarStringModel
+
+
+Note = namedtuple("Note", ["fundamental_freq", "duration", "velocity", "palm_mute"])
+
+
+def _freeze(value):
+    """Make parameter values hashable so they can be part of a cache key"""
+    if isinstance(value, np.ndarray):
+        return ("ndarray", value.dtype.str, value.shape, value.tobytes())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _note_entropy(note):
+    """The note's fields as integers, to mix into the per-stage seeds"""
+    words = np.array([note.fundamental_freq, note.duration, note.velocity], dtype=np.float64).view(np.uint64)
+    return [int(w) for w in words] + [int(bool(note.palm_mute))]
+
+
+class Stage:
+    """One step of a synthesis chain
+
+    func(signal, note, **params) returns the stage output; signal is None
+    for the first stage. `params` declares the tunable parameters and their
+    defaults. Stages must not rely on mutating their input; the pipeline
+    hands each stage a copy so cached upstream results stay intact.
+    """
+
+    def __init__(self, name, func, **params):
+        self.name = name
+        self.func = func
+        self.params = params
+
+    def resolve(self, overrides):
+        unknown = set(overrides) - set(self.params)
+        if unknown:
+            raise KeyError(f"Stage '{self.name}' has no parameters {sorted(unknown)}")
+        params = dict(self.params)
+        params.update(overrides)
+        return params
+
+
+class SynthesisPipeline:
+    """Chain of stages with a per-stage cache keyed by all upstream parameters
+
+    Each stage runs with its own seed, derived from the pipeline seed, the
+    stage index and the note, so a cached upstream result and a recomputed
+    downstream stage see the same random draws as a full render, while
+    different notes get different noise. Changing a late stage's parameters
+    therefore only recomputes that stage and what follows it. Stages draw
+    from the global np.random, whose state is restored after each render.
+    """
+
+    def __init__(self, stages, seed=0, cache_size=8):
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Stage names must be unique: {names}")
+
+        self.stages = stages
+        self.seed = seed
+        self.cache_size = cache_size
+        self._caches = [OrderedDict() for _ in stages]
+        self.hits = 0
+        self.misses = 0
+        self.stage_times = {stage.name: 0.0 for stage in stages}
+
+    def render(self, fundamental_freq, duration=2.0, velocity=1.0, palm_mute=False, **overrides):
+        """Render one note; overrides are {stage_name: {param: value}}"""
+        unknown = set(overrides) - set(self.stage_times)
+        if unknown:
+            raise KeyError(f"No stages named {sorted(unknown)}")
+
+        note = Note(fundamental_freq, duration, velocity, palm_mute)
+        key = (self.seed, note)
+        entropy = [self.seed] + _note_entropy(note)
+
+        state = np.random.get_state()
+        try:
+            signal = self._render_stages(note, key, entropy, overrides)
+        finally:
+            np.random.set_state(state)
+        return signal.copy()
+
+    def _render_stages(self, note, key, entropy, overrides):
+        signal = None
+        for i, stage in enumerate(self.stages):
+            params = stage.resolve(overrides.get(stage.name, {}))
+            key = key + ((stage.name, _freeze(params)),)
+            cache = self._caches[i]
+
+            if key in cache:
+                cache.move_to_end(key)
+                signal = cache[key]
+                self.hits += 1
+                continue
+
+            self.misses += 1
+            np.random.seed(np.random.SeedSequence(entropy + [i]).generate_state(1)[0])
+            t0 = time.perf_counter()
+            signal = stage.func(None if signal is None else signal.copy(), note, **params)
+            self.stage_times[stage.name] += time.perf_counter() - t0
+
+            cache[key] = signal
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+        return signal
+
+    def clear_cache(self):
+        for cache in self._caches:
+            cache.clear()
+
+
+# === The existing string models expressed as stage chains ===
+
+def basic_pipeline(fs=44100, dtype=np.float64, seed=0):
+    """GuitarStringModel as a pipeline"""
+    model = GuitarStringModel(fs, dtype)
+    return SynthesisPipeline([
+        Stage("excitation", lambda s, note: model._excitation(note.fundamental_freq, note.velocity)),
+        Stage("string", lambda s, note: model._string_loop(s, note.duration, note.palm_mute)),
+        Stage("body", lambda s, note: model._add_body_resonance(s, note.fundamental_freq)),
+        Stage("di", lambda s, note, saturation_gain, hum_freq:
+              model._di_processing(s, saturation_gain, hum_freq),
+              saturation_gain=None, hum_freq=None),
+        Stage("normalize", lambda s, note, peak: model._normalize(s, peak), peak=0.8),
+    ], seed)
+
+
+def improved_pipeline(fs=44100, dtype=np.float64, seed=0, excitation_bank=None):
+    """ImprovedGuitarStringModel as a pipeline"""
+    model = ImprovedGuitarStringModel(fs, dtype, excitation_bank)
+    return SynthesisPipeline([
+        Stage("excitation", lambda s, note, pick_hardness:
+              model._excitation(note.fundamental_freq, note.velocity, pick_hardness),
+              pick_hardness=0.5),
+        Stage("string", lambda s, note: model._string_loop(
+            s, note.fundamental_freq, note.duration, note.velocity, note.palm_mute)),
+        Stage("body", lambda s, note: model._add_enhanced_body_resonance(s, note.fundamental_freq)),
+        Stage("harmonics", lambda s, note: model._add_realistic_harmonics(s, note.fundamental_freq)),
+        Stage("di", lambda s, note, drive, hum_freq, noise_level:
+              model._enhanced_di_processing(s, drive, hum_freq, noise_level),
+              drive=1.002, hum_freq=60, noise_level=0.00005),
+        Stage("normalize", lambda s, note, peak: model._normalize(s, peak), peak=0.95),
+    ], seed)
+
+
+def realistic_pipeline(fs=44100, dtype=np.float64, seed=0, excitation_bank=None):
+    """RealisticGuitarStringModel as a pipeline"""
+    model = RealisticGuitarStringModel(fs, dtype, excitation_bank)
+    return SynthesisPipeline([
+        Stage("excitation", lambda s, note, pick_hardness:
+              model._excitation(note.fundamental_freq, note.velocity, pick_hardness),
+              pick_hardness=0.5),
+        Stage("string", lambda s, note, **loop_params: model._string_loop(
+            s, note.fundamental_freq, note.duration, note.velocity, note.palm_mute, **loop_params),
+              base_damping=None, initial_decay_rate=None, sustain_decay_rate=None,
+              transition_time=0.02, lp_coeff=None, noise_probability=0.0005),
+        Stage("harmonics", lambda s, note, harmonic_frequencies:
+              model._add_realistic_harmonics_v2(s, note.fundamental_freq, harmonic_frequencies),
+              harmonic_frequencies=None),
+        Stage("spectral_richness", lambda s, note, formant_frequencies:
+              model._add_spectral_richness(s, note.fundamental_freq, formant_frequencies),
+              formant_frequencies=None),
+        Stage("normalize", lambda s, note, scale, asymmetry_factor, clip_level:
+              model._normalize_like_natural(s, scale, asymmetry_factor, clip_level),
+              scale=1.45, asymmetry_factor=1.02, clip_level=0.95),
+    ], seed)
+
+
+# Usage example: sweep the DI drive without re-running the string loop
+def main():
+    pipeline = improved_pipeline(seed=1)
+    Bb1 = 58.27
+
+    t0 = time.perf_counter()
+    pipeline.render(Bb1, duration=2.0, velocity=0.7)
+    full_render = time.perf_counter() - t0
+
+    drives = np.linspace(1.0, 1.5, 10)
+    t0 = time.perf_counter()
+    for drive in drives:
+        pipeline.render(Bb1, duration=2.0, velocity=0.7, di={"drive": float(drive)})
+    sweep = time.perf_counter() - t0
+
+    print(f"Full render: {full_render * 1000:.0f} ms")
+    print(f"DI sweep: {sweep / len(drives) * 1000:.0f} ms per setting "
+          f"({sweep / len(drives) / full_render:.1%} of a full render)")
+    print(f"Cache hits/misses: {pipeline.hits}/{pipeline.misses}")
+    for name, seconds in pipeline.stage_times.items():
+        print(f"  {name:10s} {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()